@@ -19,11 +19,12 @@ bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
 
 # Импорт обработчиков из пакета handlers
-from reports.handlers import sale_handlers, expense_handlers, cash_handlers, report_handlers, expenses_edit_handlers, sale_edit_handlers, reports_monthly_handlers, search_handler, search_sale_handlers
+from reports.handlers import sale_handlers, expense_handlers, cash_handlers, report_handlers, expenses_edit_handlers, sale_edit_handlers, reports_monthly_handlers, search_handler, search_sale_handlers, excel_handlers
 from reports.handlers.expenses_edit_handlers import EditExpenseState
 from reports.handlers.search_handler import SearchStates
 from reports.filters.role_filters import IsAdmin, IsCreator
 from reports.buttons.menu_buttons import keyboard
+from reports import api_client, db_executor, rendering
 
 # Регистрируем хендлеры для продажи
 dp.message.register(sale_handlers.start_sale, Command("sale"), IsAdmin())
@@ -86,12 +87,19 @@ dp.message.register(report_handlers.handle_report_by_date, F.text.casefold() ==
 # Регистрируем callback-хендлеры для отчетов
 dp.callback_query.register(report_handlers.handle_report_date_selection, F.data.startswith("report_date:"))
 dp.callback_query.register(report_handlers.handle_report_pagination, F.data.startswith("report_page:"))
+dp.callback_query.register(report_handlers.handle_report_years, F.data == "report_years")
+dp.callback_query.register(report_handlers.handle_report_year, F.data.startswith("report_year:"))
+dp.callback_query.register(report_handlers.handle_report_month, F.data.startswith("report_month:"))
+
+# Выгрузка в Excel по кнопке под отчетом
+dp.callback_query.register(excel_handlers.send_excel, F.data.startswith("xlsx:"))
 
 # Отчеты за месяц
 dp.message.register(reports_monthly_handlers.monthly_report_start, Command("monthly_report"))
 dp.message.register(reports_monthly_handlers.monthly_report_start, F.text.casefold() == "📆 отчеты за месяц")
 dp.callback_query.register(reports_monthly_handlers.handle_year_selection, F.data.startswith("year_"))
 dp.callback_query.register(reports_monthly_handlers.handle_month_selection, F.data.startswith("month_"))
+dp.callback_query.register(reports_monthly_handlers.handle_full_year_selection, F.data.startswith("fullyear_"))
 
 
 # Регистрируем хендлеры для поиска
@@ -119,6 +127,19 @@ async def start_cmd(message: Message):
     user_id = message.from_user.id
     await message.answer(f"Привет! Твой ID {user_id}.\nОтправь его @shaxsodo если хочешь получить права пользования")
 
+# Общая HTTP-сессия к API открывается при старте бота
+async def on_startup():
+    await api_client.start()
+
+# Останавливаем пулы отрисовки и БД, закрываем HTTP-сессию вместе с ботом
+async def on_shutdown():
+    rendering.shutdown()
+    db_executor.shutdown()
+    await api_client.close()
+
+dp.startup.register(on_startup)
+dp.shutdown.register(on_shutdown)
+
 async def main():
     logging.basicConfig(level=logging.INFO)
     await dp.start_polling(bot)
@@ -1,7 +1,11 @@
 from django.contrib import admin
-from reports.models import Sale, Expense, CashRegister
+from reports.models import Sale, Expense, CashRegister, DailySummary, MonthlySummary, CashMovement, ReportFileCache
 
 # Register your models here.
 admin.site.register(Sale)
 admin.site.register(Expense)
-admin.site.register(CashRegister)
\ No newline at end of file
+admin.site.register(CashRegister)
+admin.site.register(DailySummary)
+admin.site.register(MonthlySummary)
+admin.site.register(CashMovement)
+admin.site.register(ReportFileCache)
@@ -0,0 +1,115 @@
+# reports/api_client.py
+"""
+Общий HTTP-клиент бота для запросов к API.
+
+Одна aiohttp.ClientSession на весь процесс бота: соединения к API держатся
+открытыми (keep-alive) и переиспользуются, а не открываются на каждый запрос.
+Сессия создается при старте диспетчера (start) и закрывается при остановке (close).
+Адрес API задается одной настройкой API_BASE_URL.
+
+Повторы: GET/PUT/DELETE повторяются при сетевых ошибках, таймаутах и ответах
+502/503/504. POST повторяется только если соединение не удалось установить
+(запрос гарантированно не дошел до сервера), чтобы не создать запись дважды,
+или если у него есть заголовок Idempotency-Key: повтор получит сохраненный ответ.
+"""
+import asyncio
+import json
+import logging
+from typing import NamedTuple
+
+import aiohttp
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+
+_session = None
+
+
+class ApiResponse(NamedTuple):
+    """Ответ API, прочитанный целиком (соединение уже возвращено в пул)"""
+    status: int
+    text: str
+
+    def json(self):
+        return json.loads(self.text)
+
+
+async def start():
+    """Создает сессию с пулом соединений (при старте бота)"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=settings.API_POOL_SIZE, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=settings.API_TIMEOUT)
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _session
+
+
+async def close():
+    """Закрывает сессию и все соединения (при остановке бота)"""
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+def url(path):
+    """Полный адрес по относительному пути ("sales/" -> API_BASE_URL + "sales/")"""
+    return settings.API_BASE_URL.rstrip("/") + "/" + path.lstrip("/")
+
+
+def _is_idempotent(method, headers):
+    return method in IDEMPOTENT_METHODS or bool(headers and headers.get("Idempotency-Key"))
+
+
+def _can_retry(method, headers, error):
+    if _is_idempotent(method, headers):
+        return True
+    # Соединение не установлено — запрос точно не отправлен
+    return isinstance(error, aiohttp.ClientConnectorError)
+
+
+async def request(method, path, *, json=None, params=None, headers=None, timeout=None):
+    """
+    Запрос к API. path — относительный путь без ведущего слеша ("sales/").
+    Возвращает ApiResponse; сетевые ошибки после всех повторов пробрасываются.
+    """
+    session = await start()
+    method = method.upper()
+    attempts = settings.API_RETRIES + 1
+    kwargs = {"json": json, "params": params, "headers": headers}
+    if timeout is not None:
+        kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+    for attempt in range(1, attempts + 1):
+        try:
+            async with session.request(method, url(path), **kwargs) as resp:
+                text = await resp.text()
+            if resp.status in RETRY_STATUSES and _is_idempotent(method, headers) and attempt < attempts:
+                logger.warning("API %s %s вернул %s, повтор %s", method, path, resp.status, attempt)
+            else:
+                return ApiResponse(resp.status, text)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt == attempts or not _can_retry(method, headers, e):
+                raise
+            logger.warning("API %s %s: %r, повтор %s", method, path, e, attempt)
+        # Экспоненциальная пауза между попытками: 0.5, 1, 2 ... с
+        await asyncio.sleep(settings.API_RETRY_BACKOFF * 2 ** (attempt - 1))
+
+
+async def get(path, **kwargs):
+    return await request("GET", path, **kwargs)
+
+
+async def post(path, **kwargs):
+    return await request("POST", path, **kwargs)
+
+
+async def put(path, **kwargs):
+    return await request("PUT", path, **kwargs)
+
+
+async def delete(path, **kwargs):
+    return await request("DELETE", path, **kwargs)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reports'
+
+    def ready(self):
+        # Подключаем сигналы, поддерживающие сводки
+        from reports import signals  # noqa: F401
+        # Проверка настроек реплики (manage.py check, runserver, migrate)
+        from reports import db_router  # noqa: F401
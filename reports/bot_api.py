@@ -0,0 +1,217 @@
+# reports/bot_api.py
+"""
+Операции записи и отчеты для бота: напрямую через reports.services или по HTTP через API.
+
+Режим задается настройкой BOT_API_MODE:
+  "local" — бот сам вызывает сервисный слой (одна транзакция, без сетевых запросов);
+  "http"  — запросы идут в API через reports.api_client, как раньше.
+Входные данные в обоих режимах проверяются одними и теми же сериализаторами,
+а ответ приходит в одном виде — Result(status, data) с кодом как у API.
+
+Операции создания принимают key — ключ идемпотентности (new_key(), один на
+отправку формы). Повтор с тем же ключом не создает запись второй раз, а получает
+первый ответ: по HTTP через заголовок Idempotency-Key, локально — через то же
+хранилище reports.idempotency.
+"""
+import json
+import uuid
+from typing import Any, NamedTuple
+
+from reports.db_executor import db_task
+from reports.db_router import reporting
+from django.conf import settings
+from django.urls import reverse
+
+from reports import api_client, idempotency, services
+from reports.models import Expense, Sale
+from reports.renderers import dumps
+from reports.serializers import ExpenseSerializer, SaleSerializer
+
+
+class Result(NamedTuple):
+    status: int
+    data: Any
+
+
+def is_local():
+    return settings.BOT_API_MODE == "local"
+
+
+def new_key():
+    """Ключ идемпотентности для одной операции"""
+    return uuid.uuid4().hex
+
+
+async def _http(method, path, key=None, **kwargs):
+    if key:
+        kwargs["headers"] = {idempotency.HEADER: key}
+    resp = await api_client.request(method, path, **kwargs)
+    try:
+        data = resp.json()
+    except ValueError:
+        data = resp.text
+    return Result(resp.status, data)
+
+
+def _save(serializer, status):
+    if not serializer.is_valid():
+        return Result(400, serializer.errors)
+    serializer.save()
+    return Result(status, serializer.data)
+
+
+def _once(path, key, payload, func):
+    """func() -> Result; с ключом выполняется один раз, как POST API по этому пути"""
+    if not key:
+        return func()
+    try:
+        return idempotency.run(
+            f"POST {reverse('api-root')}{path}", key, dumps(payload), func,
+            lambda result: (result.status, dumps(result.data)),
+            lambda status, body: Result(status, json.loads(body)),
+        )
+    except idempotency.KeyReused as e:
+        return Result(422, {"error": str(e)})
+
+
+@db_task
+def _create_sale(data, key=None):
+    return _once("sales/", key, data, lambda: _save(SaleSerializer(data=data), 201))
+
+
+@db_task
+def _add_expense(data, key=None):
+    return _once("expenses/", key, data, lambda: _save(ExpenseSerializer(data=data), 201))
+
+
+@db_task
+def _update_sale(sale_id, data):
+    sale = Sale.objects.filter(pk=sale_id).first()
+    if sale is None:
+        return Result(404, {"detail": "Не найдено."})
+    return _save(SaleSerializer(sale, data=data, partial=True), 200)
+
+
+@db_task
+def _delete_sale(sale_id):
+    sale = Sale.objects.filter(pk=sale_id).first()
+    if sale is None:
+        return Result(404, {"detail": "Не найдено."})
+    services.delete_sale(sale)
+    return Result(204, None)
+
+
+@db_task
+def _update_expense(expense_id, data):
+    expense = Expense.objects.filter(pk=expense_id).first()
+    if expense is None:
+        return Result(404, {"detail": "Не найдено."})
+    return _save(ExpenseSerializer(expense, data=data), 200)
+
+
+@db_task
+def _delete_expense(expense_id):
+    expense = Expense.objects.filter(pk=expense_id).first()
+    if expense is None:
+        return Result(404, {"detail": "Не найдено."})
+    services.delete_expense(expense)
+    return Result(204, None)
+
+
+def _top_up(amount, sale_id):
+    sale = Sale.objects.filter(pk=sale_id).first() if sale_id else None
+    try:
+        cash_total = services.top_up_cash(amount, sale=sale)
+    except services.ServiceError as e:
+        return Result(400, {"error": str(e)})
+    return Result(201, {"cash_total": str(cash_total)})
+
+
+def _top_up_payload(amount, sale_id):
+    # Тело POST cash/: продажа входит и в отпечаток ключа идемпотентности
+    return {"amount": amount, "sale": sale_id}
+
+
+@db_task
+def _top_up_cash(amount, sale_id=None, key=None):
+    return _once("cash/", key, _top_up_payload(amount, sale_id), lambda: _top_up(amount, sale_id))
+
+
+def _as_json(data):
+    # Тот же JSON, что отдает API (Decimal и даты -> строки)
+    return json.loads(json.dumps(data, default=str))
+
+
+@db_task
+@reporting()
+def _daily_report(day):
+    return Result(200, _as_json(services.daily_report(day)))
+
+
+@db_task
+@reporting()
+def _range_report(date_from, date_to):
+    try:
+        return Result(200, _as_json(services.range_report(date_from, date_to)))
+    except services.ServiceError as e:
+        return Result(400, {"error": str(e)})
+
+
+async def create_sale(data, key=None):
+    """Продажа; за наличные в ответе есть cash_total — новый остаток кассы"""
+    if is_local():
+        return await _create_sale(data, key)
+    return await _http("POST", "sales/", key, json=data)
+
+
+async def add_expense(data, key=None):
+    if is_local():
+        return await _add_expense(data, key)
+    return await _http("POST", "expenses/", key, json=data)
+
+
+async def update_sale(sale_id, data):
+    """Изменение продажи (только переданные поля); касса меняется на разницу наличных"""
+    if is_local():
+        return await _update_sale(sale_id, data)
+    return await _http("PATCH", f"sales/{sale_id}/", json=data)
+
+
+async def delete_sale(sale_id):
+    """Удаление продажи; внесенные ей наличные возвращаются из кассы"""
+    if is_local():
+        return await _delete_sale(sale_id)
+    return await _http("DELETE", f"sales/{sale_id}/")
+
+
+async def update_expense(expense_id, data):
+    if is_local():
+        return await _update_expense(expense_id, data)
+    return await _http("PUT", f"expenses/{expense_id}/", json=data)
+
+
+async def delete_expense(expense_id):
+    if is_local():
+        return await _delete_expense(expense_id)
+    return await _http("DELETE", f"expenses/{expense_id}/")
+
+
+async def top_up_cash(amount, sale_id=None, key=None):
+    """Пополнение кассы; sale_id — продажа, из-за которой пополняется касса"""
+    if is_local():
+        return await _top_up_cash(amount, sale_id, key)
+    return await _http("POST", "cash/", key, json=_top_up_payload(amount, sale_id))
+
+
+async def daily_report(day=None):
+    """Итоги дня (по умолчанию сегодня) со списком расходов"""
+    if is_local():
+        return await _daily_report(day)
+    return await _http("GET", "report/", params={"date": day.isoformat()} if day else None)
+
+
+async def range_report(date_from, date_to):
+    """Итоги за период с разбивкой по дням"""
+    if is_local():
+        return await _range_report(date_from, date_to)
+    return await _http("GET", "report/range/", params={"from": date_from.isoformat(), "to": date_to.isoformat()})
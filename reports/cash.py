@@ -0,0 +1,78 @@
+# reports/cash.py
+"""
+Касса: журнал движений (CashMovement) и остаток за день (CashRegister).
+
+Остаток меняется только здесь и только атомарным UPDATE cash_total = cash_total + delta,
+поэтому параллельные продажи за наличные не теряют обновления. Запись в журнал
+идет первой, а UPDATE строки кассы — последним шагом транзакции, чтобы блокировка
+строки держалась как можно меньше.
+
+Остаток входит в отчет за день, поэтому версия дня (DailySummary) должна вырасти.
+Если в той же транзакции пишется продажа или расход за сегодня, версию уже подняло
+обновление сводки — тогда вызывающий передает touch=False, и строка сводки
+не обновляется второй раз.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from reports.models import CashMovement, CashRegister
+from reports import rollups
+
+
+def record_movement(amount, sale=None, expense=None, touch=True):
+    """Записывает движение по кассе за сегодня и возвращает новый остаток"""
+    amount = rollups.money(amount)
+    today = date.today()  # та же дата, что ставит auto_now_add у CashRegister
+    with transaction.atomic():
+        CashMovement.objects.create(date=today, amount=amount, sale=sale, expense=expense)
+        return _add_to_register(today, amount, touch)
+
+
+def record_movements(movements, touch=True):
+    """
+    Записывает пачку движений [(сумма, продажа, расход), ...] одним INSERT в журнал
+    и меняет остаток один раз на их сумму. Возвращает новый остаток.
+    """
+    today = date.today()
+    rows = [
+        CashMovement(date=today, amount=rollups.money(amount), sale=sale, expense=expense)
+        for amount, sale, expense in movements
+    ]
+    with transaction.atomic():
+        CashMovement.objects.bulk_create(rows)
+        return _add_to_register(today, sum((row.amount for row in rows), Decimal("0.00")), touch)
+
+
+def _add_to_register(today, amount, touch):
+    if touch:
+        # Сводка до кассы — в том же порядке блокирует строки запись продажи или расхода
+        rollups.touch(today)
+    if not CashRegister.objects.filter(date=today).update(cash_total=F("cash_total") + amount):
+        try:
+            with transaction.atomic():
+                # bulk_create без сигналов: версию дня сигнал CashRegister поднял бы второй раз
+                CashRegister.objects.bulk_create([CashRegister(cash_total=amount)])
+        except IntegrityError:
+            # Строку за сегодня успела создать параллельная транзакция
+            CashRegister.objects.filter(date=today).update(cash_total=F("cash_total") + amount)
+    return get_balance_by_date(today)
+
+
+def get_balance_by_date(day):
+    """Остаток в кассе за день: одна строка по уникальному индексу на date"""
+    balance = CashRegister.objects.filter(date=day).values_list("cash_total", flat=True).first()
+    return balance if balance is not None else Decimal("0.00")
+
+
+def get_balances(date_from, date_to):
+    """Остатки в кассе по дням периода одним запросом: {дата: остаток}"""
+    return dict(CashRegister.objects.filter(date__range=(date_from, date_to)).values_list("date", "cash_total"))
+
+
+def get_latest_balance():
+    """Остаток в кассе на последний день, когда касса менялась"""
+    balance = CashRegister.objects.order_by("-date").values_list("cash_total", flat=True).first()
+    return balance if balance is not None else Decimal("0.00")
@@ -0,0 +1,55 @@
+# reports/conditional.py
+"""
+Условные GET по версии данных (ETag / Last-Modified).
+
+Версия берется из дневных сводок (rollups.period_version): она растет при любой
+записи, затрагивающей день. Если у клиента актуальная версия, ответ 304 отдается
+после одного агрегата по DailySummary, без запросов к Sale и Expense.
+
+Кроме периода и версии в ETag входят остальные параметры запроса (фильтры, ?fields=,
+курсор, размер страницы) и выбранный формат ответа: при тех же данных это другой ответ.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.views.decorators.http import condition
+
+from reports import rollups
+
+
+def _variant(request):
+    # Параметры в порядке имен, чтобы ?a=1&b=2 и ?b=2&a=1 давали один ETag
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    # У view DRF — тип согласованного рендерера (JSON или Browsable API)
+    media_type = getattr(request, "accepted_media_type", "") or ""
+    return hashlib.sha1(f"{query}|{media_type}".encode()).hexdigest()[:12]
+
+
+def data_version(period):
+    """
+    Декоратор view: ETag и Last-Modified по версии данных за период.
+    period(request, *args, **kwargs) -> (date_from, date_to), None — все время;
+    ValueError (неверные параметры) — заголовки не ставятся, ошибку вернет сама view.
+    """
+    def get_version(request, *args, **kwargs):
+        # Считается один раз на запрос: нужна и для ETag, и для Last-Modified
+        if not hasattr(request, "_data_version"):
+            try:
+                date_from, date_to = period(request, *args, **kwargs)
+            except ValueError:
+                request._data_version = None
+            else:
+                version = rollups.period_version(date_from, date_to)
+                version["etag"] = f"{date_from or ''}:{date_to or ''}:{version['stamp']}:{_variant(request)}"
+                request._data_version = version
+        return request._data_version
+
+    def etag(request, *args, **kwargs):
+        version = get_version(request, *args, **kwargs)
+        return version and version["etag"]
+
+    def last_modified(request, *args, **kwargs):
+        version = get_version(request, *args, **kwargs)
+        return version and version["updated_at"]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
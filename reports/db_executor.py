@@ -0,0 +1,92 @@
+# reports/db_executor.py
+"""
+Пул потоков для запросов бота к БД.
+
+@sync_to_async по умолчанию (thread_sensitive=True) выполняет весь ORM бота
+в одном потоке, и запросы разных пользователей идут строго по очереди.
+Здесь запросы выполняются в пуле из BOT_DB_WORKERS потоков. У Django
+соединение с БД свое у каждого потока, поэтому соединений столько же, сколько
+воркеров, и они переиспользуются между задачами (с CONN_MAX_AGE > 0).
+
+Вокруг каждой задачи вызывается close_old_connections, как Django делает
+в начале и в конце HTTP-запроса: соединение после ошибки или старше CONN_MAX_AGE
+закрывается, а с CONN_HEALTH_CHECKS перед следующим использованием проверяется.
+Каждая функция выполняется целиком в одном потоке, поэтому transaction.atomic
+внутри нее работает как обычно. contextvars вызывающей корутины передаются в поток.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+_executor = None
+# Потоки текущего пула: их регистрирует initializer при старте каждого потока
+_workers = set()
+_workers_lock = threading.Lock()
+
+
+def _register_worker(workers):
+    with _workers_lock:
+        workers.add(threading.current_thread())
+
+
+def get_executor():
+    global _executor, _workers
+    if _executor is None:
+        _workers = set()
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BOT_DB_WORKERS, thread_name_prefix="bot-db",
+            initializer=_register_worker, initargs=(_workers,),
+        )
+    return _executor
+
+
+def _task(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run(func, *args, **kwargs):
+    """Выполняет func(*args, **kwargs) в пуле потоков БД и возвращает результат"""
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, _task, func, args, kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), call)
+
+
+def db_task(func):
+    """Декоратор вместо @sync_to_async: синхронная функция с ORM становится корутиной"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return wrapper
+
+
+def _close_connections(barrier):
+    connections.close_all()
+    try:
+        # Ждем остальных, чтобы каждая задача попала в свой поток
+        barrier.wait(timeout=5)
+    except threading.BrokenBarrierError:
+        pass
+
+
+def shutdown():
+    """Закрывает соединения всех воркеров и останавливает пул (при остановке бота)"""
+    global _executor
+    if _executor is None:
+        return
+    executor, _executor = _executor, None
+    # Соединение можно закрыть только из его потока: по задаче на каждый поток
+    with _workers_lock:
+        workers = len(_workers) or 1
+    barrier = threading.Barrier(workers)
+    for _ in range(workers):
+        executor.submit(_close_connections, barrier)
+    executor.shutdown(wait=True)
@@ -0,0 +1,73 @@
+# reports/db_router.py
+"""
+Чтение отчетов и поиска с реплики БД.
+
+Код отчетов помечается reporting() (декоратор или with): чтения внутри идут
+в БД settings.REPORTS_DB_ALIAS, если такой алиас есть в DATABASES, иначе —
+в основную. Все записи идут в основную БД. Чтения без пометки (обработчики
+изменения продаж и расходов, API записи) тоже остаются на основной: им нужно
+видеть только что записанное, а реплика может отставать. Внутри транзакции
+на основной БД чтение тоже идет в нее, даже под reporting().
+
+Пометка хранится в contextvar, поэтому переходит вместе с задачей в поток
+db_executor и не влияет на соседние запросы.
+"""
+import contextvars
+import os
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import checks
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_reporting = contextvars.ContextVar("reporting", default=False)
+
+
+@contextmanager
+def reporting():
+    """Чтения внутри — только для отчетов, их можно брать с реплики"""
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def replica_alias():
+    """Алиас реплики из настроек или None, если реплика не настроена"""
+    alias = getattr(settings, "REPORTS_DB_ALIAS", None)
+    return alias if alias and alias != DEFAULT_DB_ALIAS and alias in settings.DATABASES else None
+
+
+def reading_replica():
+    """Пойдут ли чтения в текущем контексте на реплику"""
+    return bool(_reporting.get() and replica_alias() and not connections[DEFAULT_DB_ALIAS].in_atomic_block)
+
+
+class ReportingRouter:
+    def db_for_read(self, model, **hints):
+        return replica_alias() if reading_replica() else None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной БД: объекты с нее можно связывать с основными
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+@checks.register()
+def check_replica(app_configs, **kwargs):
+    """Реплика задана в окружении, но до DATABASES не дошла — отчеты молча читались бы из основной БД"""
+    alias = getattr(settings, "REPORTS_DB_ALIAS", None)
+    requested = any(os.getenv(name) for name in ("REPORTS_DB_ALIAS", "DB_REPLICA_HOST", "DB_REPLICA_NAME"))
+    if not alias or alias == DEFAULT_DB_ALIAS or not requested or replica_alias():
+        return []
+    return [checks.Warning(
+        f"Реплика для отчетов задана в окружении, но алиаса '{alias}' нет в DATABASES",
+        hint="Отчеты читаются из основной БД. Проверьте REPORTS_DB_ALIAS и DB_REPLICA_HOST/DB_REPLICA_NAME",
+        id="reports.W001",
+    )]
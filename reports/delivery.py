@@ -0,0 +1,63 @@
+# reports/delivery.py
+"""
+Доставка готовых отчетов в Telegram без временных файлов.
+
+Отчет (PDF, PNG) передается как Artifact: обычно это байты в памяти, которые
+уходят в Telegram через BufferedInputFile. Только если артефакт больше
+REPORT_MAX_BUFFER_BYTES, он сохраняется в уникальный временный файл
+и удаляется сразу после отправки.
+"""
+import os
+import tempfile
+from typing import NamedTuple, Optional
+
+from aiogram.types import BufferedInputFile, FSInputFile
+
+
+class Artifact(NamedTuple):
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+
+    @property
+    def size(self):
+        return len(self.data) if self.data is not None else os.path.getsize(self.path)
+
+    def input_file(self, filename):
+        if self.data is not None:
+            return BufferedInputFile(self.data, filename=filename)
+        return FSInputFile(self.path, filename=filename)
+
+    def cleanup(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def make_artifact(data, max_bytes):
+    """Байты в памяти или, если они больше max_bytes, уникальный временный файл"""
+    if len(data) <= max_bytes:
+        return Artifact(data=data)
+    with tempfile.NamedTemporaryFile(prefix="report_", delete=False) as f:
+        f.write(data)
+    return Artifact(path=f.name)
+
+
+def file_artifact(path, max_bytes):
+    """Артефакт из готового временного файла: небольшой читается в память, файл удаляется"""
+    if os.path.getsize(path) > max_bytes:
+        return Artifact(path=path)
+    try:
+        with open(path, "rb") as f:
+            return Artifact(data=f.read())
+    finally:
+        os.remove(path)
+
+
+async def send(method, artifact, filename, **kwargs):
+    """
+    Отправляет артефакт методом aiogram (answer_document, answer_photo и т.п.)
+    и освобождает временный файл, если он был. Возвращает отправленное сообщение.
+    """
+    try:
+        return await method(artifact.input_file(filename), **kwargs)
+    finally:
+        artifact.cleanup()
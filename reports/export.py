@@ -0,0 +1,92 @@
+# reports/export.py
+"""
+Потоковая выгрузка продаж и расходов в CSV или NDJSON.
+
+Строки читаются из БД итератором (на PostgreSQL — серверный курсор) порциями
+по CHUNK_SIZE и сразу кодируются в куски ответа, поэтому память не зависит
+от объема выгрузки. Сжатие gzip тоже потоковое.
+"""
+import csv
+import zlib
+
+from django.db.models import Q
+
+from reports import search
+from reports.models import Expense, Sale
+from reports.renderers import dumps
+
+SALE_FIELDS = ("id", "name", "quantity", "price_per_unit", "total_price", "payment_method", "sale_date", "shipment_date", "comment")
+EXPENSE_FIELDS = ("id", "reason", "amount", "comment", "date")
+CHUNK_SIZE = 2000
+# Сколько строк CSV отдавать одним куском ответа
+CSV_BATCH = 500
+
+
+def sales_queryset(date_from=None, date_to=None, query=None, payment_method=None):
+    """Продажи для выгрузки: период, слова поиска (как в поиске бота) и способ оплаты"""
+    sales = search.search_sales(query) if query else Sale.objects.all()
+    if date_from:
+        sales = sales.filter(sale_date__gte=date_from)
+    if date_to:
+        sales = sales.filter(sale_date__lte=date_to)
+    if payment_method:
+        sales = sales.filter(payment_method=payment_method)
+    return sales.order_by("sale_date", "id")
+
+
+def expenses_queryset(date_from=None, date_to=None, query=None):
+    """Расходы для выгрузки: период и слова, которые должны быть в причине или комментарии"""
+    expenses = Expense.objects.all()
+    if date_from:
+        expenses = expenses.filter(date__gte=date_from)
+    if date_to:
+        expenses = expenses.filter(date__lte=date_to)
+    for word in search.split_words(query or ""):
+        expenses = expenses.filter(Q(reason__icontains=word) | Q(comment__icontains=word))
+    return expenses.order_by("date", "id")
+
+
+def iter_rows(queryset, fields):
+    return queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Buffer:
+    """csv.writer пишет сюда, а строка сразу возвращается"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(fields, rows):
+    writer = csv.writer(_Buffer())
+    # BOM — чтобы Excel сразу открыл кириллицу в UTF-8
+    yield ("\ufeff" + writer.writerow(fields)).encode()
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow(row))
+        if len(batch) >= CSV_BATCH:
+            yield "".join(batch).encode()
+            batch = []
+    if batch:
+        yield "".join(batch).encode()
+
+
+def iter_ndjson(fields, rows):
+    for row in rows:
+        yield dumps(dict(zip(fields, row))) + b"\n"
+
+
+def gzip_stream(chunks):
+    """Сжимает поток кусков в gzip без накопления"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+FORMATS = {
+    "csv": (iter_csv, "text/csv; charset=utf-8"),
+    "ndjson": (iter_ndjson, "application/x-ndjson"),
+}
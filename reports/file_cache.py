@@ -0,0 +1,92 @@
+# reports/file_cache.py
+"""
+Кэш Telegram file_id для отчетов за прошедшие периоды.
+
+Ключ — тип отчета и период, к записи приложена версия данных периода
+(rollups.period_stamp). Пока версия не изменилась, отчет повторно отправляется
+по file_id — без запросов к продажам, отрисовки и загрузки файла. Любое изменение
+продажи, расхода или кассы в периоде меняет версию, и запись перестает подходить.
+
+Отчеты за текущий период (cacheable=False) не сохраняются, но одновременные
+запросы одного и того же отчета все равно строятся один раз (reports.singleflight).
+"""
+import logging
+
+from aiogram.exceptions import TelegramBadRequest
+from reports.db_executor import db_task
+from reports.db_router import reporting
+
+from reports import delivery, rollups, singleflight
+from reports.models import ReportFileCache
+
+logger = logging.getLogger(__name__)
+
+
+@db_task
+@reporting()
+def get_stamp_and_file_id(kind, period, date_from, date_to, cacheable=True):
+    stamp = rollups.period_stamp(date_from, date_to)
+    if not cacheable:
+        return stamp, None
+    file_id = ReportFileCache.objects.filter(kind=kind, period=period, stamp=stamp).values_list("file_id", flat=True).first()
+    return stamp, file_id
+
+
+@db_task
+def store_file_id(kind, period, stamp, file_id):
+    ReportFileCache.objects.update_or_create(kind=kind, period=period, defaults={"stamp": stamp, "file_id": file_id})
+
+
+def _sent_file_id(sent):
+    if sent.document:
+        return sent.document.file_id
+    if sent.photo:
+        return sent.photo[-1].file_id
+    return None
+
+
+async def _send_file_id(method, file_id, kind, period, **kwargs):
+    try:
+        await method(file_id, **kwargs)
+        return True
+    except TelegramBadRequest as e:
+        # file_id мог устареть на стороне Telegram — строим отчет заново
+        logger.warning("Не удалось отправить %s %s по file_id: %s", kind, period, e)
+        return False
+
+
+async def send_cached(method, kind, period, date_from, date_to, build, filename, cacheable=True, **kwargs):
+    """
+    Отправляет отчет методом aiogram (answer_document / answer_photo).
+    date_from/date_to — период данных отчета (None — без границы).
+    build — корутинная функция, возвращающая delivery.Artifact или None (нет данных);
+    вызывается только при промахе кэша. cacheable=False — текущий период, file_id не сохраняется.
+    Одновременные запросы одного отчета (тип, период, версия данных) строят его один раз:
+    первый отправляет файл, остальные — тот же файл по полученному file_id.
+    Возвращает False, если отчета нет.
+    """
+    stamp, file_id = await get_stamp_and_file_id(kind, period, date_from, date_to, cacheable)
+    if file_id and await _send_file_id(method, file_id, kind, period, **kwargs):
+        return True
+
+    async def upload():
+        artifact = await build()
+        if artifact is None:
+            return None
+        sent = await delivery.send(method, artifact, filename, **kwargs)
+        file_id = _sent_file_id(sent)
+        if cacheable and file_id:
+            await store_file_id(kind, period, stamp, file_id)
+        # Пустая строка — отчет отправлен, но file_id не получен
+        return file_id or ""
+
+    file_id, shared = await singleflight.do((kind, period, stamp), upload)
+    if file_id is None:
+        return False
+    if shared and not (file_id and await _send_file_id(method, file_id, kind, period, **kwargs)):
+        # Чужой результат отправить не удалось — строим свой
+        artifact = await build()
+        if artifact is None:
+            return False
+        await delivery.send(method, artifact, filename, **kwargs)
+    return True
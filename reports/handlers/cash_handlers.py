@@ -1,17 +1,16 @@
 # handlers/cash_handlers.py
-import aiohttp
 from aiogram import types
 from aiogram.filters import Command
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-
-API_URL = "http://185.255.133.33:8001/api/"
+from reports import bot_api
 
 class CashState(StatesGroup):
     amount = State()
 
 async def start_cash(message: Message, state: FSMContext):
+    await state.set_data({"idempotency_key": bot_api.new_key()})
     await state.set_state(CashState.amount)
     await message.answer("Введите сумму, которую хотите добавить в кассу:\n(Если сумма с копейками, используйте точку '.')")
 
@@ -21,14 +20,12 @@ async def process_cash(message: Message, state: FSMContext):
         if cash_addition <= 0:
             await message.answer("Ошибка! Сумма пополнения должна быть положительной.")
             return
-        data = {"amount": cash_addition}
-        async with aiohttp.ClientSession() as session:
-            async with session.post(f"{API_URL}cash/", json=data) as resp:
-                if resp.status == 201:
-                    await message.answer(f"✅ В кассу добавлено {cash_addition} рублей!")
-                else:
-                    error_text = await resp.text()
-                    await message.answer(f"⚠ Ошибка при пополнении кассы! Код: {resp.status}. Текст ошибки: {error_text}")
+        key = (await state.get_data()).get("idempotency_key")
+        result = await bot_api.top_up_cash(cash_addition, key=key)
+        if result.status == 201:
+            await message.answer(f"✅ В кассу добавлено {cash_addition} рублей!")
+        else:
+            await message.answer(f"⚠ Ошибка при пополнении кассы! Код: {result.status}. Текст ошибки: {result.data}")
         await state.clear()
     except ValueError:
         await message.answer("Ошибка! Введите число.")
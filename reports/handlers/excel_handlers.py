@@ -0,0 +1,56 @@
+# handlers/excel_handlers.py
+from datetime import date, datetime
+
+from aiogram import types
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from reports import delivery, xlsx
+
+# Telegram ограничивает callback_data 64 байтами
+CALLBACK_LIMIT = 64
+
+
+def excel_callback(date_from=None, date_to=None, query=None):
+    """xlsx:<с>:<по>[:<слова поиска>], пустая дата — без границы"""
+    data = f"xlsx:{date_from or ''}:{date_to or ''}"
+    if query:
+        data += f":{query}"
+    return data
+
+
+def excel_keyboard(date_from=None, date_to=None, query=None):
+    """Кнопка «📊 Excel» под отчетом; None, если параметры не помещаются в callback_data"""
+    data = excel_callback(date_from, date_to, query)
+    if len(data.encode()) > CALLBACK_LIMIT:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="📊 Excel", callback_data=data)]])
+
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+def _period(date_from, date_to):
+    if date_from and date_from == date_to:
+        return f"за {date_from}"
+    if date_from or date_to:
+        return f"с {date_from or '...'} по {date_to or '...'}"
+    return "за все время"
+
+
+async def send_excel(callback: types.CallbackQuery):
+    """Выгрузка в Excel по кнопке «📊 Excel» (за день, период, месяц или по поиску)"""
+    _, date_from, date_to, *query = callback.data.split(":", 3)
+    date_from, date_to = _parse_date(date_from), _parse_date(date_to)
+    query = query[0] if query else None
+
+    await callback.answer("Формируем Excel...")
+    # Книга строится в отдельном потоке, строки читаются итератором
+    artifact = await xlsx.build(date_from, date_to, query)
+    if artifact is None:
+        await callback.message.answer("❌ Нет данных для выгрузки.")
+        return
+    period = _period(date_from, date_to)
+    caption = f"📊 Продажи по запросу '{query}' {period}" if query else f"📊 Отчет {period}"
+    filename = f"{'search' if query else 'report'}_{date_from or 'start'}_{date_to or date.today()}.xlsx"
+    await delivery.send(callback.message.answer_document, artifact, filename, caption=caption)
@@ -1,13 +1,11 @@
 # handlers/expense_handlers.py
-import aiohttp
 from datetime import datetime
 from aiogram import types
 from aiogram.filters import Command
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-
-API_URL = "http://185.255.133.33:8001/api/"
+from reports import bot_api
 
 class ExpenseState(StatesGroup):
     reason = State()
@@ -15,6 +13,7 @@ class ExpenseState(StatesGroup):
     comment = State()
 
 async def start_expense(message: Message, state: FSMContext):
+    await state.set_data({"idempotency_key": bot_api.new_key()})
     await state.set_state(ExpenseState.reason)
     await message.answer("Введите причину расхода:")
 
@@ -34,22 +33,18 @@ async def process_amount(message: Message, state: FSMContext):
 
 async def process_expense_comment(message: Message, state: FSMContext):
     data = await state.get_data()
+    key = data.pop("idempotency_key", None)
     data["comment"] = message.text if message.text else ""
     data["date"] = datetime.now().strftime("%Y-%m-%d")
-    async with aiohttp.ClientSession() as session:
-        async with session.post(f"{API_URL}expenses/", json=data) as resp:
-            response_text = await resp.text()
-            print("Ответ от сервера:", response_text)  # Логируем ответ!
-            try:
-                response_data = await resp.json()
-            except Exception:
-                response_data = {}
-            if resp.status == 201:
-                await message.answer("✅ Расход добавлен!")
-            elif resp.status == 400 and "error" in response_data:
-                await message.answer(f"⚠ Ошибка: {response_data['error']}")
-            elif resp.status == 400:
-                await message.answer("⚠ Ошибка: Недостаточно денег в кассе!")
-            else:
-                await message.answer(f"⚠ Ошибка! Код: {resp.status}")
+    result = await bot_api.add_expense(data, key=key)
+    print("Ответ от сервера:", result.data)  # Логируем ответ!
+    response_data = result.data if isinstance(result.data, dict) else {}
+    if result.status == 201:
+        await message.answer("✅ Расход добавлен!")
+    elif result.status == 400 and "error" in response_data:
+        await message.answer(f"⚠ Ошибка: {response_data['error']}")
+    elif result.status == 400:
+        await message.answer("⚠ Ошибка: Недостаточно денег в кассе!")
+    else:
+        await message.answer(f"⚠ Ошибка! Код: {result.status}")
     await state.clear()
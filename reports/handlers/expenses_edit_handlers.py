@@ -1,22 +1,20 @@
 from aiogram import types
 from aiogram.filters import Command
-import aiohttp
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import CallbackQuery
-from asgiref.sync import sync_to_async
+from reports.db_executor import db_task
 from datetime import date
 from reports.models import Expense
-
-API_URL = "http://185.255.133.33:8001/api/expenses/"
+from reports import bot_api
 
 # Определяем состояние для редактирования
 class EditExpenseState(StatesGroup):
     amount = State()
     comment = State()
 
-@sync_to_async
+@db_task
 def get_today_expenses():
     """Получает список расходов за сегодня"""
     return list(Expense.objects.filter(date=date.today()))
@@ -49,10 +47,9 @@ async def get_expenses(message: types.Message):
 
 
 async def delete_expense(expense_id: int):
-    """Удаление расхода через API"""
-    async with aiohttp.ClientSession() as session:
-        async with session.delete(f"{API_URL}{expense_id}/") as resp:
-            return resp.status == 204
+    """Удаление расхода (сумма возвращается в кассу)"""
+    result = await bot_api.delete_expense(expense_id)
+    return result.status == 204
 
 # Определяем состояния для редактирования
 class EditExpenseState(StatesGroup):
@@ -111,14 +108,11 @@ async def edit_expense_reason(message: types.Message, state: FSMContext):
         "date": current_date,  # Передаем дату в правильном формате
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.put(f"{API_URL}{expense_id}/", json=update_data) as resp:
-            response_text = await resp.text()  # Получаем текст ответа сервера
-
-            if resp.status == 200:
-                await message.answer("✅ Расход обновлён!")
-            else:
-                await message.answer(f"⚠ Ошибка при обновлении. Код: {resp.status}\nОтвет: {response_text}")
+    result = await bot_api.update_expense(expense_id, update_data)
+    if result.status == 200:
+        await message.answer("✅ Расход обновлён!")
+    else:
+        await message.answer(f"⚠ Ошибка при обновлении. Код: {result.status}\nОтвет: {result.data}")
 
     await state.clear()
 
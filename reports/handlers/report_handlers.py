@@ -1,182 +1,175 @@
 # handlers/report_handlers.py
-import os
-import aiohttp
 from datetime import date, datetime
 from io import BytesIO
 from aiogram import types
 from aiogram.filters import Command
-from aiogram.types import Message, FSInputFile
-from asgiref.sync import sync_to_async
-from openpyxl import Workbook
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reports.models import Sale, Expense, CashRegister
-from reportlab.lib.utils import simpleSplit
-from django.utils.timezone import now
+from aiogram.types import Message
+from reports.db_executor import db_task
+from reports.db_router import reporting
+from reports.models import Sale, Expense
+from reports import bot_api, cash, file_cache, pdf, rendering, rollups
 from aiogram import F
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from reports.handlers.excel_handlers import excel_keyboard
 
-# Регистрация шрифта для кириллицы
-pdfmetrics.registerFont(TTFont('DejaVuSans', 'DejaVuSans.ttf'))
-pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', 'DejaVuSans-Bold.ttf'))
-@sync_to_async
-def get_sales_by_date(date):
-    return list(Sale.objects.filter(sale_date=date))
+@db_task
+@reporting()
+def has_data_for_date(date):
+    """Проверка по одной строке сводки, были ли продажи или расходы за день"""
+    summary = rollups.get_summary(date)
+    return bool(summary and (summary.sales_count or summary.expenses_count))
 
-@sync_to_async
-def get_expenses_by_date(date):
-    return list(Expense.objects.filter(date=date))
+def has_data(report):
+    """Были ли продажи или расходы в отчете bot_api.daily_report"""
+    return bool(report["sales_count"] or report["expenses_count"])
 
-@sync_to_async
-def get_cash_balance_by_date(date):
-    return CashRegister.objects.filter(date=date).latest('date').cash_total
+def iter_sales_by_date(date):
+    return Sale.objects.filter(sale_date=date).order_by('id').values_list(*pdf.SALE_FIELDS).iterator(chunk_size=500)
 
-@sync_to_async
-def get_today_sales():
-    return list(Sale.objects.filter(sale_date=date.today()))
+def iter_expenses_by_date(date):
+    return Expense.objects.filter(date=date).order_by('id').values_list(*pdf.EXPENSE_FIELDS).iterator(chunk_size=500)
 
-@sync_to_async
-def get_today_expenses():
-    return list(Expense.objects.filter(date=date.today()))
-
-@sync_to_async
+@db_task
+@reporting()
 def get_cash_balance():
-    return CashRegister.objects.latest('date').cash_total
+    return cash.get_latest_balance()
+
+def generate_daily_pdf(report_date, cash_balance):
+    """Выполняется в пуле процессов: строки читаются курсором порциями и сразу рисуются"""
+    with rendering.worker_db():
+        return generate_pdf(iter_sales_by_date(report_date), iter_expenses_by_date(report_date), cash_balance, report_date)
+
+async def build_daily_pdf(report_date, cash_balance):
+    """PDF за день в виде delivery.Artifact (в памяти, без файлов на диске)"""
+    return await rendering.render(generate_daily_pdf, report_date, cash_balance)
 
 
 def generate_pdf(sales, expenses, cash_balance, report_date):
     buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    c.setFont("DejaVuSans", 16)
-    c.drawString(100, 750, f"Ежедневный отчет на {report_date}")
-    c.setFont("DejaVuSans", 12)
-    c.drawString(100, 730, "Продажи:")
-    y_position = 710
-    c.setFont("DejaVuSans", 10)
-    payment_method = {'invoice': 'По счету', 'card': 'По карте', 'cash': 'Наличными'}
-    for sale in sales:
-        sale_text = f"{sale.name} - {sale.quantity} шт - {sale.total_price} руб. - {payment_method[sale.payment_method]} - {sale.sale_date}"
-        c.drawString(100, y_position, sale_text)
-        y_position -= 15  # Отступ для следующей строки
-
-        if sale.comment:  # Если есть комментарий, добавляем его жирным
-            c.setFont("DejaVuSans-Bold", 10)  # Делаем жирный шрифт
-            comment_lines = simpleSplit(f"- {sale.comment}", "DejaVuSans-Bold", 10, 400)  # Разбиваем текст, если он длинный
-            for line in comment_lines:
-                c.drawString(120, y_position, line)  # Чуть правее основного текста
-                y_position -= 15  # Отступ вниз
-            c.setFont("DejaVuSans", 10)  # Возвращаем обычный шрифт
-
-        y_position -= 10  # Отступ между продажами
-    c.setFont("DejaVuSans", 12)
-    c.drawString(100, y_position - 20, "Расходы:")
-    y_position -= 40
-    c.setFont("DejaVuSans", 10)
-    for expense in expenses:
-        c.drawString(100, y_position, f"{expense.reason} - {expense.amount} руб.")
-        y_position -= 15
-        if expense.comment:  # Если есть комментарий, добавляем его жирным
-            c.setFont("DejaVuSans-Bold", 10)  # Делаем жирный шрифт
-            comment_lines = simpleSplit(f"- {expense.comment}", "DejaVuSans-Bold", 10, 400)  # Разбиваем текст, если он длинный
-            for line in comment_lines:
-                c.drawString(120, y_position, line)  # Чуть правее основного текста
-                y_position -= 15  # Отступ вниз
-            c.setFont("DejaVuSans", 10)  # Возвращаем обычный шрифт
-    c.setFont("DejaVuSans", 12)
-    c.drawString(100, y_position - 20, f"Остаток в кассе: {cash_balance} руб.")
-    c.showPage()
-    c.save()
-    buffer.seek(0)
+    pdf.render_daily_report(buffer, report_date, sales, expenses, cash_balance)
     return buffer.getvalue()
 
 async def send_report_text(message: Message):
-    async with aiohttp.ClientSession() as session:
-        async with session.get("http://185.255.133.33:8001/api/report/") as resp:
-            data = await resp.json()
-            text = f"📊 *Отчет за сегодня:*\n"
-            text += f"💰 Продано на {data['total_sales']} руб.\n"
-            text += f"   - 💵 Наличными: {data.get('sales_cash', 0)} руб.\n"
-            text += f"   - 💳 По карте: {data.get('sales_card', 0)} руб.\n"
-            text += f"   - 🏦 По счету: {data.get('sales_invoice', 0)} руб.\n\n"
-            text += f"💸 *Расходы: {data['total_expenses']} руб.*\n"
-            if data.get("expenses", []):
-                for expense in data["expenses"]:
-                    text += f"   - {expense['reason']}: {expense['amount']} руб.\n\n"
-            else:
-                text += "   - ❌ Нет расходов.\n\n"
-            text += f"🛠 Остаток в кассе: {data['cash_total']} руб."
-            await message.answer(text, parse_mode="Markdown")
+    data = (await bot_api.daily_report()).data
+    text = f"📊 *Отчет за сегодня:*\n"
+    text += f"💰 Продано на {data['total_sales']} руб.\n"
+    text += f"   - 💵 Наличными: {data.get('sales_cash', 0)} руб.\n"
+    text += f"   - 💳 По карте: {data.get('sales_card', 0)} руб.\n"
+    text += f"   - 🏦 По счету: {data.get('sales_invoice', 0)} руб.\n\n"
+    text += f"💸 *Расходы: {data['total_expenses']} руб.*\n"
+    if data.get("expenses", []):
+        for expense in data["expenses"]:
+            text += f"   - {expense['reason']}: {expense['amount']} руб.\n\n"
+    else:
+        text += "   - ❌ Нет расходов.\n\n"
+    text += f"🛠 Остаток в кассе: {data['cash_total']} руб."
+    await message.answer(text, parse_mode="Markdown")
 
 async def send_report_pdf(message: Message):
-    today = now().date()
-    sales = await get_today_sales()
-    expenses = await get_today_expenses()
-    if not sales and not expenses:
-        await message.answer("❌ Нет данных о продажах и расходах за сегодня.")
+    today = date.today()
+
+    async def build():
+        if not await has_data_for_date(today):
+            return None
+        cash_balance = await get_cash_balance()
+        return await build_daily_pdf(today, cash_balance)
+
+    # Одновременные запросы отчета за сегодня строят его один раз
+    try:
+        sent = await file_cache.send_cached(
+            message.answer_document, "today", str(today), today, today,
+            build, f"Отчет_на_{today}.pdf", cacheable=False, caption="Отчет за сегодняшний день",
+            reply_markup=excel_keyboard(today, today),
+        )
+    except rendering.RenderTimeout as e:
+        await message.answer(f"⏳ {e}. Попробуйте позже.")
         return
-    cash_balance = await get_cash_balance()
-    pdf_data = generate_pdf(sales, expenses, cash_balance, today)
-    pdf_filename = "report.pdf"
-    with open(pdf_filename, "wb") as f:
-        f.write(pdf_data)
-    pdf_file = FSInputFile(pdf_filename, filename=f"Отчет_на_{today}.pdf")
-    await message.answer_document(pdf_file, caption="Отчет за сегодняшний день")
-    os.remove(pdf_filename)
+    if not sent:
+        await message.answer("❌ Нет данных о продажах и расходах за сегодня.")
 
 
 
 ###################
 
 
-@sync_to_async
-def get_unique_dates():
-    # Получаем уникальные даты из таблицы Sale
-    sales_dates = Sale.objects.dates('sale_date', 'day').distinct()
-    # Получаем уникальные даты из таблицы Expense
-    expenses_dates = Expense.objects.dates('date', 'day').distinct()
-    # Объединяем и сортируем даты
-    all_dates = sorted(set(sales_dates) | set(expenses_dates), reverse=True)
-    return all_dates
+# Дат на одной странице клавиатуры
+ITEMS_PER_PAGE = 5
+
 
+@db_task
+@reporting()
+def get_active_dates(before=None, after=None, month=None):
+    """
+    Даты с отчетами для страницы клавиатуры одним запросом к индексу дневных сводок:
+    ITEMS_PER_PAGE + 1 строка, лишняя показывает, есть ли следующая страница.
+    month — (год, месяц), чтобы листать только внутри месяца.
+    """
+    date_from, date_to = rollups.month_bounds(*month) if month else (None, None)
+    return rollups.active_dates(before, after, date_from, date_to, limit=ITEMS_PER_PAGE + 1)
 
-# Кнопки пагинации
 
+@db_task
+@reporting()
+def get_active_months(year=None):
+    return rollups.active_months(year)
 
 
-async def create_dates_keyboard(page: int = 0, items_per_page: int = 5):
+async def create_dates_keyboard(before=None, after=None, month=None):
     """
-    Создает инлайн-клавиатуру с датами и пагинацией.
+    Создает инлайн-клавиатуру с датами. Страницы листаются по курсору — последней
+    (или первой) показанной дате, а не по номеру страницы.
     """
-    dates = await get_unique_dates()
-    total_dates = len(dates)
-    total_pages = (total_dates + items_per_page - 1) // items_per_page
+    dates = await get_active_dates(before, after, month)
+    if after:
+        # Листаем к новым датам: лишняя — самая новая
+        has_newer, has_older = len(dates) > ITEMS_PER_PAGE, True
+        dates = dates[-ITEMS_PER_PAGE:]
+    else:
+        has_newer, has_older = before is not None, len(dates) > ITEMS_PER_PAGE
+        dates = dates[:ITEMS_PER_PAGE]
+    scope = f":{month[0]}-{month[1]:02d}" if month else ""
 
-    # Ограничиваем страницы
-    if page < 0:
-        page = 0
-    elif page >= total_pages:
-        page = total_pages - 1
+    # Создаем клавиатуру
+    builder = InlineKeyboardBuilder()
+    for day in dates:
+        builder.row(InlineKeyboardButton(text=day.strftime("%Y-%m-%d"), callback_data=f"report_date:{day}"))
+
+    # Кнопки пагинации
+    pages = []
+    if dates and has_newer:
+        pages.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"report_page:newer:{dates[0]}{scope}"))
+    if dates and has_older:
+        pages.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=f"report_page:older:{dates[-1]}{scope}"))
+    if pages:
+        builder.row(*pages)
+
+    # Переход по годам и месяцам, чтобы не листать длинную историю
+    if month:
+        builder.row(InlineKeyboardButton(text=f"↩️ Месяцы {month[0]}", callback_data=f"report_year:{month[0]}"))
+    else:
+        builder.row(InlineKeyboardButton(text="📆 По годам", callback_data="report_years"))
+    return builder.as_markup()
 
-    # Получаем даты для текущей страницы
-    start = page * items_per_page
-    end = start + items_per_page
-    current_dates = dates[start:end]
 
-    # Создаем клавиатуру
+async def create_years_keyboard():
     builder = InlineKeyboardBuilder()
-    for date in current_dates:
-        builder.button(text=date.strftime("%Y-%m-%d"), callback_data=f"report_date:{date}")
+    years = sorted({year for year, _ in await get_active_months()}, reverse=True)
+    for year in years:
+        builder.button(text=str(year), callback_data=f"report_year:{year}")
+    builder.adjust(3)
+    builder.row(InlineKeyboardButton(text="📅 Последние даты", callback_data="report_page:latest"))
+    return builder.as_markup()
+
 
-    # Добавляем кнопки пагинации
-    if page > 0:
-        builder.button(text="⬅️ Назад", callback_data=f"report_page:{page - 1}")
-    if page < total_pages - 1:
-        builder.button(text="Вперед ➡️", callback_data=f"report_page:{page + 1}")
+async def create_months_keyboard(year):
+    from reports.handlers.reports_monthly_handlers import MONTHS_RU
 
-    builder.adjust(1)  # Одна кнопка на строку
+    builder = InlineKeyboardBuilder()
+    for _, month in await get_active_months(year):
+        builder.button(text=MONTHS_RU[month - 1], callback_data=f"report_month:{year}-{month:02d}")
+    builder.adjust(3)
+    builder.row(InlineKeyboardButton(text="↩️ Годы", callback_data="report_years"))
     return builder.as_markup()
 
 
@@ -185,8 +178,6 @@ async def handle_report_by_date(message: Message):
     await message.answer("Выберите дату для отчета:", reply_markup=keyboard)
 
 
-
-
 async def handle_report_date_selection(callback: types.CallbackQuery):
     """
     Обработчик выбора даты для отчета.
@@ -195,39 +186,72 @@ async def handle_report_date_selection(callback: types.CallbackQuery):
     date_str = callback.data.split(":")[1]
     report_date = datetime.strptime(date_str, "%Y-%m-%d").date()
 
-    # Получаем данные за выбранную дату
-    sales = await get_sales_by_date(report_date)
-    expenses = await get_expenses_by_date(report_date)
-    if not sales and not expenses:
+    # Итоги и остаток кассы за выбранную дату — из отчета за день
+    report = (await bot_api.daily_report(report_date)).data
+    if not has_data(report):
         await callback.answer("❌ Нет данных за выбранную дату.", show_alert=True)
         return
 
     # Формируем PDF-отчет
-    cash_balance = await get_cash_balance_by_date(report_date)
-    pdf_data = generate_pdf(sales, expenses, cash_balance, report_date)
-    pdf_filename = f"report_{report_date}.pdf"
-    with open(pdf_filename, "wb") as f:
-        f.write(pdf_data)
-
-    # Отправляем PDF-файл
-    pdf_file = FSInputFile(pdf_filename, filename=f"Отчет_на_{report_date}.pdf")
-    await callback.message.answer_document(pdf_file, caption=f"Отчет за {report_date}")
-    os.remove(pdf_filename)
+    async def build():
+        return await build_daily_pdf(report_date, report["cash_total"])
+
+    # Отчет за прошедший день отправляется по сохраненному file_id, пока данные дня не менялись
+    try:
+        await file_cache.send_cached(
+            callback.message.answer_document, "daily", str(report_date), report_date, report_date,
+            build, f"Отчет_на_{report_date}.pdf", cacheable=report_date < date.today(),
+            caption=f"Отчет за {report_date}", reply_markup=excel_keyboard(report_date, report_date),
+        )
+    except rendering.RenderTimeout as e:
+        await callback.answer(f"⏳ {e}. Попробуйте позже.", show_alert=True)
+        return
 
     # Закрываем уведомление о нажатии кнопки
     await callback.answer()
 
 
+def _parse_month(value):
+    year, month = value.split("-")
+    return int(year), int(month)
+
+
 async def handle_report_pagination(callback: types.CallbackQuery):
     """
     Обработчик пагинации для клавиатуры с датами.
+    report_page:older:<дата>[:<год-месяц>] — даты раньше, newer — позже, latest — первая страница.
     """
-    # Извлекаем номер страницы из callback_data
-    page = int(callback.data.split(":")[1])
-
-    # Обновляем клавиатуру с новой страницей
-    keyboard = await create_dates_keyboard(page)
+    _, direction, *rest = callback.data.split(":")
+    anchor = datetime.strptime(rest[0], "%Y-%m-%d").date() if rest else None
+    month = _parse_month(rest[1]) if len(rest) > 1 else None
+
+    if direction == "older":
+        keyboard = await create_dates_keyboard(before=anchor, month=month)
+    elif direction == "newer":
+        keyboard = await create_dates_keyboard(after=anchor, month=month)
+    else:
+        keyboard = await create_dates_keyboard()
     await callback.message.edit_reply_markup(reply_markup=keyboard)
 
     # Закрываем уведомление о нажатии кнопки
     await callback.answer()
+
+
+async def handle_report_years(callback: types.CallbackQuery):
+    """Годы, в которых есть отчеты"""
+    await callback.message.edit_reply_markup(reply_markup=await create_years_keyboard())
+    await callback.answer()
+
+
+async def handle_report_year(callback: types.CallbackQuery):
+    """Месяцы выбранного года, в которых есть отчеты"""
+    year = int(callback.data.split(":")[1])
+    await callback.message.edit_reply_markup(reply_markup=await create_months_keyboard(year))
+    await callback.answer()
+
+
+async def handle_report_month(callback: types.CallbackQuery):
+    """Даты выбранного месяца"""
+    month = _parse_month(callback.data.split(":")[1])
+    await callback.message.edit_reply_markup(reply_markup=await create_dates_keyboard(month=month))
+    await callback.answer()
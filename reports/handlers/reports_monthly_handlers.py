@@ -1,6 +1,5 @@
-import os
 import calendar
-from datetime import datetime
+from datetime import date, datetime
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -8,8 +7,11 @@ from reportlab.lib.pagesizes import letter
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfbase import pdfmetrics
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.types import Message, FSInputFile, CallbackQuery
-from asgiref.sync import sync_to_async
+from aiogram.types import Message, CallbackQuery
+from reports.db_executor import db_task
+from reports.db_router import reporting
+from reports import file_cache, rendering, rollups
+from reports.handlers.excel_handlers import excel_keyboard
 
 import matplotlib
 matplotlib.use('Agg')  # Используем бэкенд без графического интерфейса
@@ -27,170 +29,178 @@ async def create_year_selector():
         keyboard.button(text=str(year), callback_data=f"year_{year}")
     return keyboard.as_markup()
 
+MONTHS_RU = ["Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+             "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"]
+
 # Клавиатура выбора месяца
 async def create_month_selector(year: int):
     keyboard = InlineKeyboardBuilder()
-    months_dict = {
-    "January": "Январь",
-    "February": "Февраль",
-    "March": "Март",
-    "April": "Апрель",
-    "May": "Май",
-    "June": "Июнь",
-    "July": "Июль",
-    "August": "Август",
-    "September": "Сентябрь",
-    "October": "Октябрь",
-    "November": "Ноябрь",
-    "December": "Декабрь"
-    }
-
-    for i, month in enumerate(calendar.month_name[1:], start=1):
-        keyboard.button(text=months_dict[month], callback_data=f"month_{i}_{year}")
+    for i, month in enumerate(MONTHS_RU, start=1):
+        keyboard.button(text=month, callback_data=f"month_{i}_{year}")
+    keyboard.button(text="📆 Весь год", callback_data=f"fullyear_{year}")
     keyboard.adjust(1)
     return keyboard.as_markup()
 
 
-# Генерация отчета в графиках
-async def generate_sales_expense_chart(month: int, year: int) -> str:
-    # Получаем данные за месяц
-    sales_data = await get_monthly_sales(month, year)
-    expenses_data = await get_monthly_expenses(month, year)
-
-    dates = sorted(set(sales_data.keys()) | set(expenses_data.keys()))
-    sales = [sales_data.get(date, {}).get("total", 0) for date in dates]
-    expenses = [expenses_data.get(date, 0) for date in dates]
-
-    # Строим график
+# Отрисовка графика (выполняется в пуле процессов, на входе только простые данные)
+def render_chart(title, dates, sales, expenses):
     plt.figure(figsize=(10, 5))
     plt.plot(dates, sales, label="Продажи", marker="o", linestyle="-", color="blue")
     plt.plot(dates, expenses, label="Расходы", marker="s", linestyle="--", color="red")
 
     plt.xlabel("Дата")
     plt.ylabel("Сумма (руб)")
-    plt.title(f"Продажи и расходы за {month}.{year}")
+    plt.title(title)
     plt.legend()
     plt.xticks(rotation=45)
 
-    # Сохраняем на диск
-    filename = f"chart_{month}_{year}.png"
-    plt.savefig(filename, format="png")
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format="png")
     plt.close()
-
-    return filename  # возвращаем путь к файлу
-
+    return buffer.getvalue()
 
 
+# Генерация отчета в графиках
+async def generate_sales_expense_chart(month: int, year: int):
+    # Получаем данные за месяц
+    sales_data, expenses_data = await get_monthly_data(month, year)
 
-# Генерация PDF отчета
-async def generate_monthly_report(month: int, year: int):
-    filename = f"monthly_report_{month}_{year}.pdf"
-    doc = SimpleDocTemplate(filename, pagesize=letter)
+    dates = sorted(set(sales_data.keys()) | set(expenses_data.keys()))
+    sales = [float(sales_data.get(date, {}).get("total", 0)) for date in dates]
+    expenses = [float(expenses_data.get(date, 0)) for date in dates]
+
+    # Возвращаем PNG в виде delivery.Artifact, без файла на диске
+    return await rendering.render(render_chart, f"Продажи и расходы за {month}.{year}", dates, sales, expenses)
+
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),  # Фон для заголовков
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),  # Цвет текста в заголовках
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),  # Выравнивание текста по центру
+    ('FONTNAME', (0, 0), (-1, 0), 'DejaVuSans'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),  # Фон для данных
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),  # Толщина и цвет линии сетки
+    ('LINEABOVE', (0, 0), (-1, 0), 2, colors.black),  # Линии над заголовками
+    ('LINEBELOW', (0, 0), (-1, -1), 1, colors.black),  # Линии под таблицей
+    ('LINEBEFORE', (0, 0), (0, -1), 1, colors.black),  # Линии перед первым столбцом
+    ('LINEAFTER', (0, 0), (0, -1), 1, colors.black),  # Линии после последнего столбца
+])
+
+# Отрисовка PDF со сводной таблицей (выполняется в пуле процессов).
+# rows — кортежи (подпись, всего, наличные, карта, счет, расходы), totals — такой же кортеж без подписи
+def render_summary_pdf(title, first_column, rows, totals, cyrillic_labels=False):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
     styles = getSampleStyleSheet()
-    
+
     # Создаем новый уникальный стиль
     styles.add(ParagraphStyle(name='CustomTitle', fontName='DejaVuSans-Bold', fontSize=16, alignment=1, leading=50, spaceBefore=10,  spaceAfter=10))
     styles.add(ParagraphStyle(name='Russian', fontName='DejaVuSans', fontSize=12, leading=30, spaceBefore=10,  spaceAfter=10))
 
-    elements = []
-    month_name = calendar.month_name[month]
-    
     # Используем новый стиль для заголовка
-    elements.append(Paragraph(f"Отчет за {month_name} {year}", styles['CustomTitle']))
-
-    sales_data = await get_monthly_sales(month, year)
-    expenses_data = await get_monthly_expenses(month, year)
-
-    if not sales_data and not expenses_data:
-        return None  # Возвращаем None вместо создания PDF
-
+    elements = [Paragraph(title, styles['CustomTitle'])]
 
     # Формируем таблицу
-    data = [["Дата", "Общая сумма", "Наличные", "Карта", "Счет", "Расходы"]]
-    total_sales = {'total': 0, 'cash': 0, 'card': 0, 'invoice': 0}
-    total_expenses = 0
-
-    for day in sorted(set(sales_data.keys()) | set(expenses_data.keys())):
-        day_sales = sales_data.get(day, {})
-        day_expenses = expenses_data.get(day, 0)
-
-        total_sales['total'] += day_sales.get('total', 0)
-        total_sales['cash'] += day_sales.get('cash', 0)
-        total_sales['card'] += day_sales.get('card', 0)
-        total_sales['invoice'] += day_sales.get('invoice', 0)
-        total_expenses += day_expenses
-
-        data.append([ 
-            day.strftime("%Y-%m-%d"),
-            f"{day_sales.get('total', 0):,.0f} p.",
-            f"{day_sales.get('cash', 0):,.0f} p.",
-            f"{day_sales.get('card', 0):,.0f} p.",
-            f"{day_sales.get('invoice', 0):,.0f} p.",
-            f"{day_expenses:,.0f} p." if day_expenses else "-"
+    data = [[first_column, "Общая сумма", "Наличные", "Карта", "Счет", "Расходы"]]
+    for label, total, cash, card, invoice, expenses in rows:
+        data.append([
+            label,
+            f"{total:,.0f} p.",
+            f"{cash:,.0f} p.",
+            f"{card:,.0f} p.",
+            f"{invoice:,.0f} p.",
+            f"{expenses:,.0f} p." if expenses else "-"
         ])
 
     table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),  # Фон для заголовков
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),  # Цвет текста в заголовках
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),  # Выравнивание текста по центру
-        ('FONTNAME', (0, 0), (-1, 0), 'DejaVuSans'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),  # Фон для данных
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),  # Толщина и цвет линии сетки
-        ('LINEABOVE', (0, 0), (-1, 0), 2, colors.black),  # Линии над заголовками
-        ('LINEBELOW', (0, 0), (-1, -1), 1, colors.black),  # Линии под таблицей
-        ('LINEBEFORE', (0, 0), (0, -1), 1, colors.black),  # Линии перед первым столбцом
-        ('LINEAFTER', (0, 0), (0, -1), 1, colors.black),  # Линии после последнего столбца
-    ]))
-
+    table.setStyle(TABLE_STYLE)
+    if cyrillic_labels:
+        table.setStyle(TableStyle([('FONTNAME', (0, 1), (0, -1), 'DejaVuSans')]))  # Подписи строк кириллицей
     elements.append(table)
 
     # Общие суммы, красиво отформатированы
-    elements.append(Paragraph(f"Общая сумма продаж: {total_sales['total']:,.0f} руб.", styles['Russian']))
+    total, cash, card, invoice, expenses = totals
+    elements.append(Paragraph(f"Общая сумма продаж: {total:,.0f} руб.", styles['Russian']))
     elements.append(Paragraph(
-        f"Наличными: {total_sales['cash']:,.0f} руб. | Картой: {total_sales['card']:,.0f} руб. | По счету: {total_sales['invoice']:,.0f} руб.",
+        f"Наличными: {cash:,.0f} руб. | Картой: {card:,.0f} руб. | По счету: {invoice:,.0f} руб.",
         styles['Russian']
     ))
-    elements.append(Paragraph(f"Общая сумма расходов: {total_expenses:,.0f} руб.", styles['Russian']))
+    elements.append(Paragraph(f"Общая сумма расходов: {expenses:,.0f} руб.", styles['Russian']))
 
     doc.build(elements)
-    return filename
-
-# Получение данных из БД
-@sync_to_async
-def get_monthly_sales(month: int, year: int):
-    from reports.models import Sale
-    from django.db.models import Sum, Q
-    from collections import defaultdict
-
-    sales = Sale.objects.filter(sale_date__month=month, sale_date__year=year).values('sale_date').annotate(
-        total=Sum('total_price'),
-        cash=Sum('total_price', filter=Q(payment_method='cash')),
-        card=Sum('total_price', filter=Q(payment_method='card')),
-        invoice=Sum('total_price', filter=Q(payment_method='invoice'))
-    )
-
-    result = defaultdict(dict)
-    for s in sales:
-        date = s['sale_date']
-        result[date] = {
-            'total': s['total'] or 0,
-            'cash': s['cash'] or 0,
-            'card': s['card'] or 0,
-            'invoice': s['invoice'] or 0
-        }
-    return result
-
-@sync_to_async
-def get_monthly_expenses(month: int, year: int):
-    from reports.models import Expense
-    from django.db.models import Sum
-    from collections import defaultdict
-
-    expenses = Expense.objects.filter(date__month=month, date__year=year).values('date').annotate(total=Sum('amount'))
-    return {e['date']: e['total'] for e in expenses}
+    return buffer.getvalue()
+
+# Генерация PDF отчета
+async def generate_monthly_report(month: int, year: int):
+    sales_data, expenses_data = await get_monthly_data(month, year)
+
+    if not sales_data and not expenses_data:
+        return None  # Возвращаем None вместо создания PDF
+
+    rows = []
+    for day in sorted(set(sales_data.keys()) | set(expenses_data.keys())):
+        day_sales = sales_data.get(day, {})
+        rows.append((
+            day.strftime("%Y-%m-%d"),
+            day_sales.get('total', 0),
+            day_sales.get('cash', 0),
+            day_sales.get('card', 0),
+            day_sales.get('invoice', 0),
+            expenses_data.get(day, 0),
+        ))
+
+    # Итоги за месяц — одна строка месячной сводки; если ее нет (сводки не пересчитаны), сумма по дням
+    summary = await get_month_summary(month, year)
+    if summary is not None:
+        totals = (summary.sales_total, summary.sales_cash, summary.sales_card, summary.sales_invoice, summary.expenses_total)
+    else:
+        totals = tuple(sum(row[i] for row in rows) for i in range(1, 6))
+
+    month_name = calendar.month_name[month]
+    return await rendering.render(render_summary_pdf, f"Отчет за {month_name} {year}", "Дата", rows, totals)
+
+# Генерация годового PDF отчета по месячным сводкам
+async def generate_yearly_report(year: int):
+    months = await get_yearly_data(year)
+    if not months:
+        return None
+
+    rows = [
+        (MONTHS_RU[m.month - 1], m.sales_total, m.sales_cash, m.sales_card, m.sales_invoice, m.expenses_total)
+        for m in months
+    ]
+    totals = tuple(sum(row[i] for row in rows) for i in range(1, 6))
+    return await rendering.render(render_summary_pdf, f"Отчет за {year} год", "Месяц", rows, totals, True)
+
+# Получение данных из БД (из дневных и месячных сводок, без сканирования продаж)
+@db_task
+@reporting()
+def get_monthly_data(month: int, year: int):
+    sales = {}
+    expenses = {}
+    for day in rollups.get_month_days(year, month):
+        if day.sales_count:
+            sales[day.date] = {
+                'total': day.sales_total,
+                'cash': day.sales_cash,
+                'card': day.sales_card,
+                'invoice': day.sales_invoice
+            }
+        if day.expenses_count:
+            expenses[day.date] = day.expenses_total
+    return sales, expenses
+
+@db_task
+@reporting()
+def get_month_summary(month: int, year: int):
+    return rollups.get_month_summary(year, month)
+
+@db_task
+@reporting()
+def get_yearly_data(year: int):
+    return [m for m in rollups.get_year_months(year) if m.sales_count or m.expenses_count]
 
 # Хендлеры
 async def monthly_report_start(message: Message):
@@ -209,20 +219,43 @@ async def handle_month_selection(callback: CallbackQuery):
     year = int(year)
 
     await callback.answer(f"Формируем отчет за {calendar.month_name[month]} {year}...")
-    image = await generate_sales_expense_chart(month, year) # генерируем отчет в графиках
     try:
-        filename = await generate_monthly_report(month, year)
-        if filename is None:
+        # Закрытый месяц отправляется по сохраненному file_id, пока данные месяца не менялись
+        date_from, date_to = rollups.month_bounds(year, month)
+        closed = date_to < date.today()
+        period = f"{year}-{month:02d}"
+        sent = await file_cache.send_cached(
+            callback.message.answer_document, "monthly", period, date_from, date_to,
+            lambda: generate_monthly_report(month, year), f"monthly_report_{month}_{year}.pdf",
+            cacheable=closed, caption=f"Отчет за {calendar.month_name[month]} {year}",
+            reply_markup=excel_keyboard(date_from, date_to),
+        )
+        if not sent:
             await callback.message.answer(f"В этом месяце не было продаж или расходов.")
             return
-        file = FSInputFile(filename)
-        await callback.message.answer_document(file, caption=f"Отчет за {calendar.month_name[month]} {year}")
-        os.remove(filename)  # Удаляем PDF
-
-        image_path = await generate_sales_expense_chart(month, year)
-        await callback.message.answer_photo(photo=FSInputFile(image_path),
-                                            caption=f"График продаж и расходов за {month}.{year}")
-        os.remove(image_path)  # Удаляем PNG после отправки
+
+        await file_cache.send_cached(
+            callback.message.answer_photo, "monthly_chart", period, date_from, date_to,
+            lambda: generate_sales_expense_chart(month, year), f"chart_{month}_{year}.png",
+            cacheable=closed, caption=f"График продаж и расходов за {month}.{year}",
+        )
     except Exception as e:
         await callback.message.answer(f"Ошибка при формировании отчета: {str(e)}")
 
+async def handle_full_year_selection(callback: CallbackQuery):
+    _, year = callback.data.split('_')
+    year = int(year)
+
+    await callback.answer(f"Формируем отчет за {year} год...")
+    try:
+        sent = await file_cache.send_cached(
+            callback.message.answer_document, "yearly", str(year), date(year, 1, 1), date(year, 12, 31),
+            lambda: generate_yearly_report(year), f"yearly_report_{year}.pdf",
+            cacheable=year < date.today().year, caption=f"Отчет за {year} год",
+            reply_markup=excel_keyboard(date(year, 1, 1), date(year, 12, 31)),
+        )
+        if not sent:
+            await callback.message.answer(f"В {year} году не было продаж или расходов.")
+            return
+    except Exception as e:
+        await callback.message.answer(f"Ошибка при формировании отчета: {str(e)}")
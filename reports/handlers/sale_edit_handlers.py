@@ -1,5 +1,4 @@
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-import aiohttp
 import aiogram
 from datetime import date
 from aiogram import types
@@ -7,11 +6,12 @@ from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from asgiref.sync import sync_to_async
-from reports.models import Sale, CashRegister
-from decimal import Decimal
+from reports import db_executor
+from reports.db_executor import db_task
+from reports.models import Sale
+from reports import bot_api
 
-@sync_to_async
+@db_task
 def get_today_sales():
     return list(Sale.objects.filter(sale_date=date.today()))
 
@@ -38,7 +38,7 @@ async def get_all_sales(message: types.Message):
 
 async def show_sale_info(callback_query: types.CallbackQuery):
     sale_id = int(callback_query.data.split("_")[1])
-    sale = await sync_to_async(Sale.objects.get)(id=sale_id)
+    sale = await db_executor.run(Sale.objects.get, id=sale_id)
 
     payment_method = {
         'invoice': 'По счету',
@@ -70,22 +70,13 @@ async def show_sale_info(callback_query: types.CallbackQuery):
 
 async def delete_sale(callback_query: CallbackQuery):
     sale_id = int(callback_query.data.split("_")[2])
-    sale = await sync_to_async(Sale.objects.get)(id=sale_id)
 
-    if sale.payment_method == "cash":
-        # Ищем запись в кассе за сегодня
-        cash_register, created = await sync_to_async(CashRegister.objects.get_or_create)(
-            date=date.today(),
-            defaults={"cash_total": Decimal('0.00')}  # Значение по умолчанию, если запись не найдена
-        )
-        # Вычитаем сумму из кассы
-        cash_register.cash_total -= sale.total_price
-        # Защита от отрицательных значений
-        cash_register.cash_total = max(Decimal('0.00'), cash_register.cash_total)
-        await sync_to_async(cash_register.save)()
-
-    await sync_to_async(sale.delete)()
-    await callback_query.message.answer("✅ Продажа удалена!")
+    # Наличные за продажу возвращаются из кассы в той же транзакции
+    result = await bot_api.delete_sale(sale_id)
+    if result.status == 204:
+        await callback_query.message.answer("✅ Продажа удалена!")
+    else:
+        await callback_query.message.answer(f"⚠ Ошибка при удалении. Код: {result.status}\nОтвет: {result.data}")
 
 
 class EditSaleState(StatesGroup):
@@ -135,49 +126,11 @@ async def process_edit_comment(message: Message, state: FSMContext):
     data = await state.get_data()
     data["comment"] = message.text if message.text else ""
     sale_id = data.pop("sale_id")
-    sale = await sync_to_async(Sale.objects.get)(id=sale_id)
-
-    # Приводим все значения к типу Decimal
-    old_total_price = Decimal(str(sale.total_price))  # Приводим к Decimal
-    sale.total_price = Decimal(str(sale.quantity * sale.price_per_unit))  # Приводим к Decimal
-
-    old_payment_method = sale.payment_method
-
-    # Обновляем поля продажи
-    for key, value in data.items():
-        setattr(sale, key, value)
-    await sync_to_async(sale.save)()
-
-   # Обновляем кассу, если оплата была наличными
-    if old_payment_method == "cash" and sale.payment_method == "cash":
-        # Ищем запись в кассе за сегодня
-        cash_register, created = await sync_to_async(CashRegister.objects.get_or_create)(
-            date=date.today(),
-            defaults={"cash_total": Decimal('0.00')}  # Значение по умолчанию, если запись не найдена
-        )
-        if sale.total_price > old_total_price:
-            cash_register.cash_total += Decimal(str(sale.total_price)) - old_total_price
-        else:
-            cash_register.cash_total -= old_total_price - Decimal(str(sale.total_price))
-        await sync_to_async(cash_register.save)()
-
-    elif old_payment_method == "cash" and sale.payment_method != "cash":
-        # Ищем запись в кассе за сегодня
-        cash_register, created = await sync_to_async(CashRegister.objects.get_or_create)(
-            date=date.today(),
-            defaults={"cash_total": Decimal('0.00')}
-        )
-        cash_register.cash_total -= old_total_price
-        await sync_to_async(cash_register.save)()
-
-    elif old_payment_method != "cash" and sale.payment_method == "cash":
-        # Ищем запись в кассе за сегодня
-        cash_register, created = await sync_to_async(CashRegister.objects.get_or_create)(
-            date=date.today(),
-            defaults={"cash_total": Decimal('0.00')}
-        )
-        cash_register.cash_total += Decimal(str(sale.total_price))
-        await sync_to_async(cash_register.save)()
-
-    await message.answer("✅ Продажа изменена!")
+
+    # Касса меняется на разницу наличных до и после изменения
+    result = await bot_api.update_sale(sale_id, data)
+    if result.status == 200:
+        await message.answer("✅ Продажа изменена!")
+    else:
+        await message.answer(f"⚠ Ошибка при изменении. Код: {result.status}\nОтвет: {result.data}")
     await state.clear()
@@ -1,5 +1,4 @@
 # handlers/sale_handlers.py
-import aiohttp
 import aiogram
 from datetime import date
 from aiogram import types
@@ -7,8 +6,9 @@ from aiogram.filters import Command
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from asgiref.sync import sync_to_async
+from reports.db_executor import db_task
 from reports.models import Sale, CashRegister
+from reports import bot_api
 
 # Определяем состояния для продажи
 class SaleState(StatesGroup):
@@ -20,10 +20,10 @@ class SaleState(StatesGroup):
     shipment_date = State()
     comment = State()
 
-API_URL = "http://185.255.133.33:8001/api/"
-
 # Обработчик команды /sale
 async def start_sale(message: Message, state: FSMContext):
+    # Один ключ на всю форму: повторная отправка последнего шага не создаст вторую продажу
+    await state.set_data({"idempotency_key": bot_api.new_key()})
     await state.set_state(SaleState.name)
     await message.answer("Введите название фанеры:")
 
@@ -69,29 +69,22 @@ async def process_shipment_date(message: Message, state: FSMContext):
 
 async def process_comment(message: Message, state: FSMContext):
     data = await state.get_data()
+    key = data.pop("idempotency_key", None)
     data["comment"] = message.text if message.text else ""
-    async with aiohttp.ClientSession() as session:
-        async with session.post(f"{API_URL}sales/", json=data) as resp:
-            if resp.status == 201:
-                await message.answer("✅ Продажа добавлена!")
-                if data["payment_method"] == "cash":
-                    sale_amount = data["quantity"] * data["price_per_unit"]
-                    cash_data = {"amount": sale_amount}
-                    async with session.post(f"{API_URL}cash/", json=cash_data) as cash_resp:
-                        response_data = await cash_resp.json()
-                        if "cash_total" in response_data:
-                            new_balance = response_data["cash_total"]
-                            await message.answer(
-                                f"💰 Касса пополнена на {sale_amount} руб.\n🔹 Новый остаток: {new_balance} руб."
-                            )
-                        else:
-                            await message.answer(f"⚠ Ошибка при обновлении кассы: {response_data}")
-            else:
-                error_text = await resp.text()
-                await message.answer(f"⚠ Ошибка при добавлении продажи: {error_text}")
+    # Продажа за наличные пополняет кассу в той же операции, остаток приходит в ответе
+    result = await bot_api.create_sale(data, key=key)
+    if result.status == 201:
+        sale = result.data
+        await message.answer("✅ Продажа добавлена!")
+        if data["payment_method"] == "cash":
+            await message.answer(
+                f"💰 Касса пополнена на {sale['total_price']} руб.\n🔹 Новый остаток: {sale['cash_total']} руб."
+            )
+    else:
+        await message.answer(f"⚠ Ошибка при добавлении продажи: {result.data}")
     await state.clear()
 
-@sync_to_async
+@db_task
 def get_today_sales():
     return list(Sale.objects.filter(sale_date=date.today()))
 
@@ -3,23 +3,26 @@ from aiogram.types import Message
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from datetime import datetime
-from reports.models import Sale, Expense
 from aiogram.fsm.state import StatesGroup, State
-from asgiref.sync import sync_to_async
+from reports import bot_api
+from reports.db_executor import db_task
+from reports.db_router import reporting
+from reports.models import Sale, Expense
+from reports.handlers.excel_handlers import excel_keyboard
 
 class SearchStates(StatesGroup):
     waiting_for_date = State()  # Ожидание даты или диапазона дат
 
-# Функции для получения данных через Django ORM с использованием sync_to_async
-@sync_to_async
-def get_sales_by_date_range(start_date, end_date):
-    sales = Sale.objects.filter(sale_date__gte=start_date, sale_date__lte=end_date)
-    return [{"date": sale.sale_date, "amount": sale.total_price, "item": sale.name} for sale in sales]
-
-@sync_to_async
-def get_expenses_by_date_range(start_date, end_date):
-    expenses = Expense.objects.filter(date__gte=start_date, date__lte=end_date)
-    return [{"date": expense.date, "amount": expense.amount, "category": expense.reason} for expense in expenses]
+# Строки продаж и расходов за период — только нужные колонки, с реплики, если она есть
+@db_task
+@reporting()
+def get_rows_by_date_range(start_date, end_date):
+    sales = Sale.objects.filter(sale_date__range=(start_date, end_date)).order_by("sale_date", "id")
+    expenses = Expense.objects.filter(date__range=(start_date, end_date)).order_by("date", "id")
+    return (
+        list(sales.values_list("sale_date", "total_price", "name")),
+        list(expenses.values_list("date", "amount", "reason")),
+    )
 
 # Хендлер для команды /search
 async def search_prompt(message: Message, state: FSMContext):
@@ -43,28 +46,38 @@ async def process_search_query(message: Message, state: FSMContext):
         else:
             start_date = end_date = datetime.strptime(query, "%Y-%m-%d").date()
 
-        # Получаем данные по продажам и расходам
-        sales = await get_sales_by_date_range(start_date, end_date)
-        expenses = await get_expenses_by_date_range(start_date, end_date)
+        # Итоги за период (из дневных сводок) и сами строки продаж и расходов
+        result = await bot_api.range_report(start_date, end_date)
+        if result.status != 200:
+            await message.answer(f"Ошибка: {result.data.get('error', result.data)}")
+            return
+        report = result.data
 
         # Формируем ответ
-        if not sales and not expenses:
+        if not report["days"]:
             await message.answer("За указанный период данных нет.")
             return
+        sales, expenses = await get_rows_by_date_range(start_date, end_date)
 
         response = f"📅 Отчет за период {start_date} - {end_date}\n\n"
 
         if sales:
             response += "💰 *Продажи:*\n"
-            for sale in sales:
-                response += f"- {sale['date']} | {sale['amount']} руб. | {sale['item']}\n"
+            for sale_date, amount, item in sales:
+                response += f"- {sale_date} | {amount} руб. | {item}\n"
 
         if expenses:
             response += "\n💸 *Расходы:*\n"
-            for expense in expenses:
-                response += f"- {expense['date']} | {expense['amount']} руб. | {expense['category']}\n"
+            for expense_date, amount, category in expenses:
+                response += f"- {expense_date} | {amount} руб. | {category}\n"
+
+        response += f"\n💰 *Продажи: {report['total_sales']} руб.*\n"
+        response += f"   - 💵 Наличными: {report['sales_cash']} руб.\n"
+        response += f"   - 💳 По карте: {report['sales_card']} руб.\n"
+        response += f"   - 🏦 По счету: {report['sales_invoice']} руб.\n"
+        response += f"💸 *Расходы: {report['total_expenses']} руб.*\n"
 
-        await message.answer(response, parse_mode="Markdown")
+        await message.answer(response, parse_mode="Markdown", reply_markup=excel_keyboard(start_date, end_date))
 
     except ValueError:
         await message.answer("Ошибка: Неверный формат даты. Используйте `YYYY-MM-DD` или `YYYY-MM-DD - YYYY-MM-DD`.")
@@ -1,21 +1,14 @@
 from aiogram import F, types
 from aiogram.filters import Command
-from aiogram.types import Message, FSInputFile, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from datetime import datetime
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-import re
-import os
-from asgiref.sync import sync_to_async
-
-# Регистрация шрифтов для русского языка
-pdfmetrics.registerFont(TTFont('DejaVuSans', 'DejaVuSans.ttf'))
-pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', 'DejaVuSans-Bold.ttf'))
+from reports.db_executor import db_task
+from reports.db_router import reporting
+from reports import file_cache, rendering
+from reports.handlers.excel_handlers import excel_keyboard
+
 
 class SearchSale(StatesGroup):
     waiting_for_query = State()
@@ -93,115 +86,53 @@ async def process_query_with_period(message: Message, state: FSMContext):
     )
     await state.clear()
 
-@sync_to_async
-def search_sales_in_db(search_query, date_from=None, date_to=None):
-    from reports.models import Sale
-    from django.db.models import Q, Sum
-
-    # Разбиваем запрос на отдельные слова
-    search_words = re.findall(r'\w+', search_query)
-
-    # Создаем условия для поиска по каждому слову
-    q_objects = Q()
-    for word in search_words:
-        q_objects &= Q(name__icontains=word)
-
-    # Добавляем фильтр по дате если нужно
-    if date_from and date_to:
-        q_objects &= Q(sale_date__gte=date_from, sale_date__lte=date_to)
+@db_task
+@reporting()
+def search_summary_in_db(search_query, date_from=None, date_to=None):
+    from reports import search
 
-    # Получаем продажи с группировкой по месяцу и году
-    sales = Sale.objects.filter(q_objects).order_by('sale_date')
+    # Итоги по месяцам и способам оплаты считает БД одним запросом
+    return search.summarize(search.search_sales(search_query, date_from, date_to))
 
-    if not sales.exists():
-        return None
+def render_search_pdf(title, search_query, date_from, date_to, total):
+    """Выполняется в пуле процессов: строки продаж читаются курсором порциями и сразу рисуются"""
+    from io import BytesIO
+    from reports import pdf, search
 
-    # Группируем продажи по месяцам
-    grouped_sales = {}
-    for sale in sales:
-        month_year = sale.sale_date.strftime("%B %Y")
-        if month_year not in grouped_sales:
-            grouped_sales[month_year] = []
-        grouped_sales[month_year].append(sale)
-
-    return grouped_sales
+    buffer = BytesIO()
+    with rendering.worker_db():
+        # По месяцам, внутри месяца по релевантности
+        rows = search.iter_details(search.search_sales(search_query, date_from, date_to))
+        pdf.render_search_report(buffer, title, rows, total)
+    return buffer.getvalue()
 
 async def generate_and_send_report(message, search_query, date_from=None, date_to=None):
-    grouped_sales = await search_sales_in_db(search_query, date_from, date_to)
-
-    if not grouped_sales:
-        await message.answer(
-            f"По запросу '{search_query}' не найдено продаж" +
-            (f" за период с {date_from} по {date_to}" if date_from else "")
-        )
-        return
-
-    # Создаем PDF отчет
-    filename = f"sales_report_{datetime.now().timestamp()}.pdf"
-    doc = SimpleDocTemplate(filename, pagesize=letter)
-    styles = getSampleStyleSheet()
-    styles['Title'].fontName = 'DejaVuSans-Bold'
-    styles['Normal'].fontName = 'DejaVuSans'
-
-    elements = []
-
     # Заголовок
     if date_from:
         title = f"Отчет по продажам '{search_query}'\nс {date_from} по {date_to}"
     else:
         title = f"Отчет по продажам '{search_query}' за все время"
 
-    elements.append(Paragraph(title, styles['Title']))
-    elements.append(Spacer(1, 12))
-
-    # Подсчет общих сумм
-    total_quantity = 0
-    total_amount = 0
-    payment_totals = {'cash': 0, 'card': 0, 'invoice': 0}
-
-    # Добавляем данные по месяцам
-    for month_year, sales in grouped_sales.items():
-        elements.append(Paragraph(month_year, styles['Heading2']))
-
-        for sale in sales:
-            elements.append(Paragraph(
-                f"{sale.name} - {sale.quantity} шт - {sale.total_price} руб - "
-                f"{get_payment_method(sale.payment_method)} - {sale.sale_date.strftime('%d.%m.%Y')}",
-                styles['Normal']
-            ))
-
-            # Считаем общие суммы
-            total_quantity += sale.quantity
-            total_amount += sale.total_price
-            payment_totals[sale.payment_method] += sale.total_price
-
-        elements.append(Spacer(1, 12))
-
-    # Добавляем итоговую информацию
-    elements.append(Paragraph("Итого:", styles['Heading2']))
-    elements.append(Paragraph(f"Общее количество: {total_quantity} шт", styles['Normal']))
-    elements.append(Paragraph(f"Общая сумма: {total_amount} руб", styles['Normal']))
-    elements.append(Paragraph(
-        f"Наличными: {payment_totals['cash']} руб | "
-        f"Картой: {payment_totals['card']} руб | "
-        f"По счету: {payment_totals['invoice']} руб",
-        styles['Normal']
-    ))
-
-    doc.build(elements)
-
-    # Отправляем файл
-    file = FSInputFile(filename)
-    await message.answer_document(
-        file,
-        caption=title
-    )
-    os.remove(filename)
-
-def get_payment_method(method):
-    methods = {
-        'cash': 'Наличными',
-        'card': 'Картой',
-        'invoice': 'По счету'
-    }
-    return methods.get(method, method)
+    # Создаем PDF отчет
+    async def build():
+        summary = await search_summary_in_db(search_query, date_from, date_to)
+        if not summary:
+            return None
+        return await rendering.render(render_search_pdf, title, search_query, date_from, date_to, summary['total'])
+
+    # Отправляем файл; одинаковые одновременные поиски строят отчет один раз
+    try:
+        sent = await file_cache.send_cached(
+            message.answer_document, "search", f"{search_query}|{date_from}|{date_to}", date_from, date_to,
+            build, f"sales_report_{datetime.now():%Y%m%d_%H%M%S}.pdf", cacheable=False, caption=title,
+            reply_markup=excel_keyboard(date_from, date_to, search_query),
+        )
+    except rendering.RenderTimeout as e:
+        await message.answer(f"⏳ {e}. Попробуйте позже.")
+        return
+
+    if not sent:
+        await message.answer(
+            f"По запросу '{search_query}' не найдено продаж" +
+            (f" за период с {date_from} по {date_to}" if date_from else "")
+        )
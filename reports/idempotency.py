@@ -0,0 +1,120 @@
+# reports/idempotency.py
+"""
+Idempotency-Key для запросов записи (продажи, расходы, касса).
+
+Клиент (бот) передает один и тот же ключ при повторах одной операции. Первый
+запрос выполняется и сохраняет код и тело ответа в IdempotencyKey в той же
+транзакции, что и сама запись. Повтор с тем же ключом получает сохраненный
+ответ без повторной записи; одновременный повтор ждет на уникальном индексе,
+пока первый не завершится. Тот же ключ с другим телом запроса — ошибка 422.
+Ответы 5xx не сохраняются (транзакция откатывается, повтор выполнится заново).
+
+Записи хранятся не меньше IDEMPOTENCY_TTL секунд, старые удаляются попутно
+(не чаще раза в EVICT_INTERVAL секунд на процесс).
+"""
+import hashlib
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from reports.models import IdempotencyKey
+from reports.renderers import dumps
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+EVICT_INTERVAL = 60
+
+_last_eviction = 0.0
+
+
+class KeyReused(Exception):
+    """Ключ уже использован для запроса с другим телом"""
+
+
+def _digest(*parts):
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part if isinstance(part, bytes) else str(part).encode())
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+def evict(force=False):
+    """Удаляет записи старше IDEMPOTENCY_TTL"""
+    global _last_eviction
+    if not force and time.monotonic() - _last_eviction < EVICT_INTERVAL:
+        return 0
+    _last_eviction = time.monotonic()
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def run(scope, key, payload, func, encode, replay):
+    """
+    Выполняет func() один раз на (scope, key).
+    encode(результат) -> (код, тело JSON), replay(код, тело) -> результат для повтора.
+    payload — байты запроса: повтор с другим payload вызывает KeyReused.
+    """
+    evict()
+    digest, fingerprint = _digest(scope, key), _digest(payload)
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(key=digest, fingerprint=fingerprint)
+        except IntegrityError:
+            # Запрос с этим ключом уже выполнен (или только что завершился параллельно)
+            record = IdempotencyKey.objects.get(key=digest)
+            if record.fingerprint != fingerprint:
+                raise KeyReused(f"{HEADER} уже использован для другого запроса")
+            return replay(record.status, record.response)
+
+        result = func()
+        status, body = encode(result)
+        if status >= 500:
+            transaction.set_rollback(True)
+        else:
+            record.status, record.response = status, body.decode() if isinstance(body, bytes) else body
+            record.save(update_fields=["status", "response"])
+        return result
+
+
+def _encode_response(response):
+    # Response DRF еще не отрисован — кодируем его данные так же, как FastJSONRenderer
+    body = dumps(response.data) if hasattr(response, "data") else response.content
+    return response.status_code, body
+
+
+def _replay_response(status, body):
+    response = HttpResponse(body, status=status, content_type="application/json")
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    """
+    Декоратор view записи: с заголовком Idempotency-Key повтор запроса получает
+    сохраненный ответ. Без заголовка view работает как обычно.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({"error": f"{HEADER} длиннее {MAX_KEY_LENGTH} символов"}, status=400)
+        # Тело читаем из HttpRequest (у Request DRF — через _request), поток для парсеров остается
+        body = getattr(request, "_request", request).body
+        try:
+            return run(
+                f"{request.method} {request.path}", key, body,
+                lambda: view(request, *args, **kwargs), _encode_response, _replay_response,
+            )
+        except KeyReused as e:
+            return JsonResponse({"error": str(e)}, status=422)
+    return wrapper
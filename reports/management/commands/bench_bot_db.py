@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from reports import db_executor, rollups
+from reports.handlers.report_handlers import iter_expenses_by_date, iter_sales_by_date
+
+
+def _report_request(day):
+    # Чтение из БД одного отчета за день: итоги дня и строки продаж и расходов
+    rollups.get_summary(day)
+    return sum(1 for _ in iter_sales_by_date(day)) + sum(1 for _ in iter_expenses_by_date(day))
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает одновременные запросы отчетов за день от бота: @sync_to_async "
+        "(один поток) и reports.db_executor с разным числом воркеров (отчетов в секунду). "
+        "Читает уже существующие данные, ничего не меняет"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", default="1,2,4,8", help="Числа воркеров через запятую")
+        parser.add_argument("--requests", type=int, default=200, help="Одновременных запросов в прогоне")
+        parser.add_argument("--days", type=int, default=20, help="Сколько последних дней с данными запрашивать")
+
+    def handle(self, *args, workers, requests, days, **options):
+        dates = rollups.active_dates(limit=days)
+        if not dates:
+            raise CommandError("Нет данных: бенчмарку нужны продажи или расходы в БД")
+        days = [dates[i % len(dates)] for i in range(requests)]
+
+        async def bench(call):
+            started = time.perf_counter()
+            rows = sum(await asyncio.gather(*(call(day) for day in days)))
+            return time.perf_counter() - started, rows
+
+        elapsed, rows = asyncio.run(bench(sync_to_async(_report_request)))
+        self.stdout.write(f"@sync_to_async (1 поток): {requests / elapsed:.0f} отчетов/с ({rows // requests} строк в отчете)")
+
+        for count in map(int, workers.split(",")):
+            with override_settings(BOT_DB_WORKERS=count):
+                elapsed, _ = asyncio.run(bench(db_executor.db_task(_report_request)))
+                db_executor.shutdown()
+            self.stdout.write(f"db_executor, воркеров {count}: {requests / elapsed:.0f} отчетов/с")
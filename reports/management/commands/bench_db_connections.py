@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+URLS = ("/api/report/", "/api/sales/?page_size=20")
+
+# Режимы сравнения: переменные окружения для отдельного процесса на каждый режим
+MODES = (
+    ("новое соединение на запрос", {"DB_CONN_MAX_AGE": "0", "DB_POOL": "0"}),
+    ("постоянные соединения", {"DB_CONN_MAX_AGE": "600", "DB_POOL": "0"}),
+    ("пул соединений", {"DB_CONN_MAX_AGE": "0", "DB_POOL": "1"}),
+)
+
+
+def _environ(url):
+    path, _, query = url.partition("?")
+    environ = {"PATH_INFO": path, "QUERY_STRING": query, "HTTP_HOST": "localhost"}
+    setup_testing_defaults(environ)
+    return environ
+
+
+def _status(status, headers, exc_info=None):
+    if not status.startswith("200"):
+        raise CommandError(f"Ответ {status}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест соединений с БД: запросы к API через WSGIHandler из нескольких "
+        "потоков без постоянных соединений, с CONN_MAX_AGE и с пулом (запросов в секунду). "
+        "Каждый режим — отдельный процесс. Только читает данные"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Одновременных потоков-клиентов")
+        parser.add_argument("--requests", type=int, default=500, help="Запросов на поток")
+        parser.add_argument("--child", action="store_true", help="Прогон одного режима в текущем окружении")
+
+    def handle(self, *args, threads, requests, child, **options):
+        if child:
+            self.stdout.write(f"{self._run(threads, requests):.1f}")
+            return
+
+        for name, env in MODES:
+            if env["DB_POOL"] == "1" and connection.vendor != "postgresql":
+                self.stdout.write(f"{name}: пропущено, пул только для PostgreSQL")
+                continue
+            result = subprocess.run(
+                [sys.executable, sys.argv[0], "bench_db_connections", "--child", f"--threads={threads}", f"--requests={requests}"],
+                env={**os.environ, **env}, capture_output=True, text=True,
+            )
+            if result.returncode:
+                raise CommandError(f"{name}: {result.stderr.strip()}")
+            self.stdout.write(f"{name}: {float(result.stdout.splitlines()[-1]):.0f} запросов/с")
+
+    def _run(self, threads, requests):
+        db = settings.DATABASES["default"]
+        self.stderr.write(f"ENGINE={db['ENGINE']} CONN_MAX_AGE={db['CONN_MAX_AGE']}")
+        handler = WSGIHandler()
+        errors = []
+
+        def client():
+            try:
+                for i in range(requests):
+                    # Как WSGI-сервер: close() ответа шлет request_finished и закрывает
+                    # (или возвращает в пул) соединение по правилам CONN_MAX_AGE
+                    response = handler(_environ(URLS[i % len(URLS)]), _status)
+                    b"".join(response)
+                    response.close()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=client) for _ in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise CommandError(errors[0])
+        return threads * requests / elapsed
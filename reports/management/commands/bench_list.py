@@ -0,0 +1,67 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from reports.models import Sale
+from reports.renderers import dumps
+from reports.serializers import SaleSerializer
+
+FIELDS = ("id", "name", "quantity", "price_per_unit", "total_price", "payment_method", "sale_date", "shipment_date", "comment")
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает скорость JSON-списка продаж: ModelSerializer + JSONRenderer "
+        "и values() + FastJSONRenderer (строк в секунду). Тестовые продажи удаляются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000, help="Количество продаж в списке")
+        parser.add_argument("--repeat", type=int, default=3, help="Количество прогонов")
+
+    def handle(self, *args, rows, repeat, **options):
+        try:
+            with transaction.atomic():
+                # bulk_create без сигналов: сводки и касса не меняются, все откатывается в конце
+                start = date.today() - timedelta(days=365)
+                Sale.objects.bulk_create(
+                    [
+                        Sale(
+                            name=f"Фанера {i % 30} мм F/W", quantity=i % 50 + 1, price_per_unit=Decimal("1250.00"),
+                            total_price=Decimal("1250.00") * (i % 50 + 1), payment_method=("cash", "card", "invoice")[i % 3],
+                            sale_date=start + timedelta(days=i % 365), shipment_date=start, comment="Доставка" if i % 4 == 0 else "",
+                        )
+                        for i in range(rows)
+                    ],
+                    batch_size=1000,
+                )
+                queryset = Sale.objects.filter(sale_date__gte=start).order_by("-sale_date", "-id")
+
+                def serializer():
+                    return JSONRenderer().render(SaleSerializer(queryset, many=True).data)
+
+                def fast():
+                    return dumps(list(queryset.values(*FIELDS)))
+
+                results = {}
+                for name, func in (("ModelSerializer + JSONRenderer", serializer), ("values() + FastJSONRenderer", fast)):
+                    started = time.perf_counter()
+                    for _ in range(repeat):
+                        output = func()
+                    elapsed = time.perf_counter() - started
+                    results[name] = output
+                    self.stdout.write(f"{name}: {rows * repeat / elapsed:.0f} строк/с ({len(output) // 1024} КБ)")
+
+                outputs = list(results.values())
+                self.stdout.write("Вывод совпадает побайтно" if outputs[0] == outputs[1] else "ВЫВОД ОТЛИЧАЕТСЯ")
+                raise Rollback
+        except Rollback:
+            pass
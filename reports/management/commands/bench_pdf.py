@@ -0,0 +1,41 @@
+import time
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+
+from reports import pdf
+
+
+def _sales(count):
+    for i in range(count):
+        comment = "Доставка до склада клиента, разгрузка силами покупателя" if i % 4 == 0 else ""
+        yield (f"Фанера {i % 30} мм F/W", i % 50 + 1, Decimal("1250.00"), ("cash", "card", "invoice")[i % 3], date.today(), comment)
+
+
+def _expenses(count):
+    for i in range(count):
+        yield (f"Расход {i}", Decimal("300.00"), "")
+
+
+class Command(BaseCommand):
+    help = "Замеряет скорость постраничного PDF-рендерера (страниц в секунду)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="Количество продаж в отчете")
+        parser.add_argument("--repeat", type=int, default=3, help="Количество прогонов")
+
+    def handle(self, *args, rows, repeat, **options):
+        pages = 0
+        size = 0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            buffer = BytesIO()
+            pages += pdf.render_daily_report(buffer, date.today(), _sales(rows), _expenses(rows // 10), Decimal("0.00"))
+            size = buffer.tell()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{rows} строк, {pages // repeat} стр., {size // 1024} КБ: "
+            f"{pages / elapsed:.1f} стр/с, {rows * repeat / elapsed:.0f} строк/с"
+        )
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from reports import rollups
+
+
+def _date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сводки по дням из таблиц продаж и расходов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", type=_date, help="Начальная дата (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", type=_date, help="Конечная дата (YYYY-MM-DD)")
+
+    def handle(self, *args, date_from=None, date_to=None, **options):
+        days = rollups.rebuild(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f"✅ Пересчитано дней: {days}"))
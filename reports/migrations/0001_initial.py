@@ -0,0 +1,45 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="CashRegister",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField(auto_now_add=True, verbose_name="Дата")),
+                ("cash_total", models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=10, verbose_name="Остаток в кассе")),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Expense",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("reason", models.CharField(max_length=255, verbose_name="Причина расхода")),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12, verbose_name="Сумма")),
+                ("comment", models.TextField(blank=True, verbose_name="Комментарий")),
+                ("date", models.DateField(verbose_name="Дата")),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Sale",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=255, verbose_name="Название фанеры")),
+                ("quantity", models.PositiveIntegerField(verbose_name="Количество проданное")),
+                ("price_per_unit", models.DecimalField(decimal_places=2, max_digits=10, verbose_name="Цена за единицу")),
+                ("total_price", models.DecimalField(blank=True, decimal_places=2, max_digits=12, verbose_name="Общая сумма")),
+                ("payment_method", models.CharField(choices=[("invoice", "По счету"), ("card", "Картой"), ("cash", "Наличными")], max_length=10, verbose_name="Способ оплаты")),
+                ("sale_date", models.DateField(verbose_name="Дата продажи")),
+                ("shipment_date", models.DateField(verbose_name="Дата отгрузки")),
+                ("comment", models.TextField(blank=True, verbose_name="Комментарий")),
+            ],
+        ),
+    ]
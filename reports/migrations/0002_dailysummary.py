@@ -0,0 +1,26 @@
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sales_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Продажи всего')),
+                ('sales_cash', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Наличными')),
+                ('sales_card', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Картой')),
+                ('sales_invoice', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='По счету')),
+                ('sales_count', models.IntegerField(default=0, verbose_name='Количество продаж')),
+                ('expenses_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Расходы всего')),
+                ('expenses_count', models.IntegerField(default=0, verbose_name='Количество расходов')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_dailysummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sales_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Продажи всего')),
+                ('sales_cash', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Наличными')),
+                ('sales_card', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Картой')),
+                ('sales_invoice', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='По счету')),
+                ('sales_count', models.IntegerField(default=0, verbose_name='Количество продаж')),
+                ('expenses_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Расходы всего')),
+                ('expenses_count', models.IntegerField(default=0, verbose_name='Количество расходов')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Год')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Месяц')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlysummary',
+            unique_together={('year', 'month')},
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_monthlysummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+                ('expense', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='cash_movements', to='reports.expense', verbose_name='Расход')),
+                ('sale', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='cash_movements', to='reports.sale', verbose_name='Продажа')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    """Несколько строк кассы за один день сливаются в одну с суммой остатков (перед unique на date)"""
+    CashRegister = apps.get_model("reports", "CashRegister")
+    rows = CashRegister.objects.using(schema_editor.connection.alias)
+    duplicates = rows.values("date").annotate(rows=Count("id"), total=Sum("cash_total"), keep=Min("id")).filter(rows__gt=1)
+    for duplicate in duplicates:
+        rows.filter(pk=duplicate["keep"]).update(cash_total=duplicate["total"])
+        rows.filter(date=duplicate["date"]).exclude(pk=duplicate["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0004_cashmovement"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
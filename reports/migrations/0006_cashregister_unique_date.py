@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0005_merge_duplicate_cash_registers'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cashregister',
+            name='date',
+            field=models.DateField(auto_now_add=True, unique=True, verbose_name='Дата'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0006_cashregister_unique_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysummary',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Версия данных'),
+        ),
+        migrations.CreateModel(
+            name='ReportFileCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20, verbose_name='Тип отчета')),
+                ('period', models.CharField(max_length=20, verbose_name='Период')),
+                ('stamp', models.CharField(max_length=64, verbose_name='Версия данных периода')),
+                ('file_id', models.CharField(max_length=255, verbose_name='Telegram file_id')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='reportfilecache',
+            unique_together={('kind', 'period')},
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0010_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['sale_date', 'payment_method', 'total_price'], name='sale_date_method_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailysummary',
+            index=models.Index(condition=models.Q(('sales_count__gt', 0), ('expenses_count__gt', 0), _connector='OR'), fields=['date'], name='summary_active_date_idx'),
+        ),
+    ]
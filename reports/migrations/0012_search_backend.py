@@ -0,0 +1,66 @@
+from django.db import migrations
+
+FTS_TABLE = "reports_sale_fts"
+
+# Django строит icontains как UPPER("name"::text) LIKE UPPER(%s), поэтому индекс по тому же выражению
+POSTGRES_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS reports_sale_name_trgm ON reports_sale USING gin ((UPPER(name::text)) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS reports_sale_comment_trgm ON reports_sale USING gin ((UPPER(comment::text)) gin_trgm_ops)",
+]
+
+# Расширение pg_trgm не удаляем: им могут пользоваться другие схемы и приложения
+POSTGRES_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS reports_sale_comment_trgm",
+    "DROP INDEX IF EXISTS reports_sale_name_trgm",
+]
+
+SQLITE_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, comment, content='reports_sale', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS reports_sale_fts_ai AFTER INSERT ON reports_sale BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, comment) VALUES (new.id, new.name, new.comment);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS reports_sale_fts_ad AFTER DELETE ON reports_sale BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, comment) VALUES ('delete', old.id, old.name, old.comment);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS reports_sale_fts_au AFTER UPDATE ON reports_sale BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, comment) VALUES ('delete', old.id, old.name, old.comment);
+        INSERT INTO {FTS_TABLE}(rowid, name, comment) VALUES (new.id, new.name, new.comment);
+    END""",
+    # Индексируем уже существующие продажи
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS reports_sale_fts_au",
+    "DROP TRIGGER IF EXISTS reports_sale_fts_ad",
+    "DROP TRIGGER IF EXISTS reports_sale_fts_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+def install(apps, schema_editor):
+    """Поисковые индексы продаж: pg_trgm на PostgreSQL, FTS5 на SQLite; на других БД — ничего"""
+    _run(schema_editor, {"postgresql": POSTGRES_SQL, "sqlite": SQLITE_SQL})
+
+
+def uninstall(apps, schema_editor):
+    _run(schema_editor, {"postgresql": POSTGRES_REVERSE_SQL, "sqlite": SQLITE_REVERSE_SQL})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0011_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
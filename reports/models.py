@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from decimal import Decimal
 
 class Sale(models.Model):
@@ -17,9 +17,21 @@ class Sale(models.Model):
     shipment_date = models.DateField(verbose_name="Дата отгрузки")
     comment = models.TextField(blank=True, verbose_name="Комментарий")
 
+    class Meta:
+        indexes = [
+            # Курсорная пагинация и фильтр по датам, продажи за день по порядку id (PDF, списки)
+            models.Index(fields=["sale_date", "id"], name="sale_date_id_idx"),
+            models.Index(fields=["payment_method", "sale_date", "id"], name="sale_method_date_id_idx"),
+            # Суммы по дням и способам оплаты (пересчет сводок, Excel по поиску) читаются
+            # только из индекса, без обращения к строкам таблицы
+            models.Index(fields=["sale_date", "payment_method", "total_price"], name="sale_date_method_total_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         self.total_price = self.quantity * self.price_per_unit
-        super().save(*args, **kwargs)
+        # Сводка за день обновляется сигналами в той же транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} - {self.quantity} шт."
@@ -30,12 +42,109 @@ class Expense(models.Model):
     comment = models.TextField(blank=True, verbose_name="Комментарий")
     date = models.DateField(verbose_name="Дата")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["date", "id"], name="expense_date_id_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.reason} - {self.amount} руб."
 
 class CashRegister(models.Model):
-    date = models.DateField(auto_now_add=True, verbose_name="Дата")
+    date = models.DateField(auto_now_add=True, unique=True, verbose_name="Дата")
     cash_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), verbose_name="Остаток в кассе")  # Используем DecimalField
 
     def __str__(self):
         return f"Касса на {self.date}: {self.cash_total} руб."
+
+
+class CashMovement(models.Model):
+    """Журнал движений по кассе (только добавление записей)"""
+    date = models.DateField(verbose_name="Дата")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Сумма")  # + приход, - расход
+    # Без внешнего ключа в БД: запись журнала сохраняет источник и после удаления продажи/расхода
+    sale = models.ForeignKey(Sale, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name="cash_movements", verbose_name="Продажа")
+    expense = models.ForeignKey(Expense, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name="cash_movements", verbose_name="Расход")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время")
+
+    def __str__(self):
+        return f"{self.date}: {self.amount:+} руб."
+
+
+class SummaryTotals(models.Model):
+    """Общие поля сводок: суммы по способам оплаты, расходы и счетчики"""
+    sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Продажи всего")
+    sales_cash = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Наличными")
+    sales_card = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Картой")
+    sales_invoice = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="По счету")
+    sales_count = models.IntegerField(default=0, verbose_name="Количество продаж")
+    expenses_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Расходы всего")
+    expenses_count = models.IntegerField(default=0, verbose_name="Количество расходов")
+
+    class Meta:
+        abstract = True
+
+
+# Условие «в этот день были продажи или расходы» (строки сводки только с кассой его не проходят).
+# Запросы используют это же выражение, чтобы подходил частичный индекс
+ACTIVE_DAY = models.Q(sales_count__gt=0) | models.Q(expenses_count__gt=0)
+
+
+class DailySummary(SummaryTotals):
+    """Сводка за день, поддерживается инкрементально при записи Sale/Expense"""
+    date = models.DateField(unique=True, verbose_name="Дата")
+    # Растет при любой записи, затрагивающей день (в т.ч. при изменении названий и кассы)
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Версия данных")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменено")
+    class Meta:
+        indexes = [
+            # Частичный индекс: только дни с записями (отчеты за период, выбор дат)
+            models.Index(fields=["date"], condition=ACTIVE_DAY, name="summary_active_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"Сводка на {self.date}: продажи {self.sales_total} руб., расходы {self.expenses_total} руб."
+
+
+class MonthlySummary(SummaryTotals):
+    """Сводка за месяц, обновляется вместе с дневной"""
+    year = models.PositiveSmallIntegerField(verbose_name="Год")
+    month = models.PositiveSmallIntegerField(verbose_name="Месяц")
+
+    class Meta:
+        unique_together = ("year", "month")
+
+    def __str__(self):
+        return f"Сводка за {self.month:02d}.{self.year}: продажи {self.sales_total} руб., расходы {self.expenses_total} руб."
+
+
+class ReportFileCache(models.Model):
+    """file_id уже отправленного в Telegram отчета за прошедший период"""
+    kind = models.CharField(max_length=20, verbose_name="Тип отчета")
+    period = models.CharField(max_length=20, verbose_name="Период")
+    stamp = models.CharField(max_length=64, verbose_name="Версия данных периода")
+    file_id = models.CharField(max_length=255, verbose_name="Telegram file_id")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        unique_together = ("kind", "period")
+
+    def __str__(self):
+        return f"{self.kind} {self.period} ({self.stamp})"
+
+
+class IdempotencyKey(models.Model):
+    """Ответ на запрос записи с заголовком Idempotency-Key; повтор запроса получает его же"""
+    # sha256 от области (метод и путь) и ключа клиента — фиксированной длины, сколько бы ни был ключ
+    key = models.CharField(max_length=64, unique=True, verbose_name="Ключ")
+    fingerprint = models.CharField(max_length=64, verbose_name="Отпечаток тела запроса")
+    status = models.PositiveSmallIntegerField(null=True, verbose_name="Код ответа")
+    response = models.TextField(blank=True, verbose_name="Тело ответа")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Создан")
+
+    def __str__(self):
+        return f"{self.key[:12]} -> {self.status}"
@@ -0,0 +1,18 @@
+# reports/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class DateCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация по (дата, id), новые записи первыми.
+    Страница выбирается условием по дате через индекс (date, id); OFFSET остается
+    только для записей той же даты на границе страницы. Время ответа не зависит
+    от размера таблицы и номера страницы. Порядок задает view атрибутом cursor_ordering.
+    """
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    ordering = ("-date", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, "cursor_ordering", self.ordering)
@@ -0,0 +1,126 @@
+# reports/pdf.py
+"""
+Постраничный PDF-рендерер для отчетов (за день, за дату, по поиску).
+
+Строки отчета принимаются итераторами кортежей и сразу рисуются на canvas,
+при достижении нижнего поля начинается новая страница. Списки строк и ORM-объекты
+в памяти не держатся; страницы сжимаются (pageCompression), поэтому даже
+отчет на тысячи строк занимает немного памяти. Модуль не зависит от Django.
+"""
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+# Регистрация шрифта для кириллицы
+pdfmetrics.registerFont(TTFont('DejaVuSans', 'DejaVuSans.ttf'))
+pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', 'DejaVuSans-Bold.ttf'))
+
+PAYMENT_METHODS = {'invoice': 'По счету', 'card': 'По карте', 'cash': 'Наличными'}
+
+# Поля строк, которые ожидают render_* (порядок важен)
+SALE_FIELDS = ("name", "quantity", "total_price", "payment_method", "sale_date", "comment")
+EXPENSE_FIELDS = ("reason", "amount", "comment")
+SEARCH_FIELDS = ("name", "quantity", "total_price", "payment_method", "sale_date")
+
+
+class PdfWriter:
+    """Вывод строк сверху вниз с автоматическим переносом на новую страницу"""
+
+    def __init__(self, output, pagesize=letter, left=100, top=750, bottom=50, width=None):
+        self.canvas = canvas.Canvas(output, pagesize=pagesize, pageCompression=1)
+        self.left = left
+        self.top = top
+        self.bottom = bottom
+        self.width = width or pagesize[0] - 2 * left + 60
+        self.y = top
+        self.pages = 1
+
+    def new_page(self):
+        self.canvas.showPage()
+        self.pages += 1
+        self.y = self.top
+
+    def space(self, height):
+        self.y -= height
+        if self.y < self.bottom:
+            self.new_page()
+
+    def line(self, text, font="DejaVuSans", size=10, indent=0, leading=15):
+        """Строка текста; длинный текст разбивается на несколько строк по ширине"""
+        width = self.width - indent
+        for part in simpleSplit(str(text), font, size, width) or [""]:
+            if self.y < self.bottom:
+                self.new_page()
+            self.canvas.setFont(font, size)
+            self.canvas.drawString(self.left + indent, self.y, part)
+            self.y -= leading
+
+    def close(self):
+        """Завершает документ и возвращает число страниц"""
+        self.canvas.showPage()
+        self.canvas.save()
+        return self.pages
+
+
+def render_daily_report(output, report_date, sales, expenses, cash_balance):
+    """
+    Отчет за день. sales — итератор кортежей SALE_FIELDS, expenses — EXPENSE_FIELDS.
+    Возвращает число страниц.
+    """
+    pdf = PdfWriter(output)
+    pdf.line(f"Ежедневный отчет на {report_date}", size=16, leading=20)
+    pdf.line("Продажи:", size=12, leading=20)
+    for name, quantity, total_price, payment_method, sale_date, comment in sales:
+        pdf.line(f"{name} - {quantity} шт - {total_price} руб. - {PAYMENT_METHODS.get(payment_method, payment_method)} - {sale_date}")
+        if comment:  # Если есть комментарий, добавляем его жирным
+            pdf.line(f"- {comment}", font="DejaVuSans-Bold", indent=20)
+        pdf.space(10)  # Отступ между продажами
+
+    pdf.space(20)
+    pdf.line("Расходы:", size=12, leading=20)
+    for reason, amount, comment in expenses:
+        pdf.line(f"{reason} - {amount} руб.")
+        if comment:
+            pdf.line(f"- {comment}", font="DejaVuSans-Bold", indent=20)
+
+    pdf.space(20)
+    pdf.line(f"Остаток в кассе: {cash_balance} руб.", size=12)
+    return pdf.close()
+
+
+def render_search_report(output, title, sales, total):
+    """
+    Отчет по поиску. sales — итератор кортежей SEARCH_FIELDS, сгруппированных по месяцам,
+    total — итоги (quantity, amount, cash, card, invoice). Возвращает число страниц.
+    """
+    pdf = PdfWriter(output, left=72)
+    for title_line in str(title).split("\n"):
+        pdf.line(title_line, font="DejaVuSans-Bold", size=16, leading=22)
+    pdf.space(12)
+
+    # Заголовок месяца выводится при смене месяца
+    current_month = None
+    for name, quantity, total_price, payment_method, sale_date in sales:
+        month = (sale_date.year, sale_date.month)
+        if month != current_month:
+            if current_month is not None:
+                pdf.space(12)
+            pdf.line(sale_date.strftime("%B %Y"), font="DejaVuSans-Bold", size=13, leading=20)
+            current_month = month
+        pdf.line(
+            f"{name} - {quantity} шт - {total_price} руб - "
+            f"{PAYMENT_METHODS.get(payment_method, payment_method)} - {sale_date.strftime('%d.%m.%Y')}"
+        )
+
+    pdf.space(12)
+    pdf.line("Итого:", font="DejaVuSans-Bold", size=13, leading=20)
+    pdf.line(f"Общее количество: {total['quantity']} шт")
+    pdf.line(f"Общая сумма: {total['amount']} руб")
+    pdf.line(
+        f"Наличными: {total['cash']} руб | "
+        f"Картой: {total['card']} руб | "
+        f"По счету: {total['invoice']} руб"
+    )
+    return pdf.close()
@@ -0,0 +1,52 @@
+# reports/renderers.py
+"""
+Быстрый JSON для ответов API.
+
+Вывод побайтно совпадает с rest_framework.renderers.JSONRenderer при настройках
+по умолчанию (компактные разделители, UTF-8 без \\u-экранирования, \\u2028/\\u2029
+экранируются), но Decimal и даты кодируются сразу, как их отдают сериализаторы DRF:
+Decimal — строкой с копейками, date — YYYY-MM-DD. Поэтому строки из values()
+можно отдавать без ModelSerializer. Если установлен orjson, кодирует он,
+иначе стандартный json.
+"""
+import json
+from datetime import date
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен
+    orjson = None
+
+_drf_encoder = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return f"{obj:f}"
+    if isinstance(obj, date):
+        return obj.isoformat()
+    return _drf_encoder.default(obj)
+
+
+def dumps(data):
+    """JSON в байтах в формате JSONRenderer"""
+    if orjson is not None:
+        ret = orjson.dumps(data, default=_default)
+    else:
+        ret = json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+    return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на dumps; запрос с отступами (indent) обрабатывает обычный JSONRenderer"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
@@ -0,0 +1,111 @@
+# reports/rendering.py
+"""
+Пул процессов для отрисовки PDF и графиков, чтобы не блокировать event loop бота.
+
+В воркеры передаются только простые данные (кортежи, числа, даты), а не ORM-объекты;
+функция отрисовки должна быть на уровне модуля (ее передают через pickle).
+Длинные списки строк через границу процесса не передаются: воркер читает их
+из БД сам, курсором порциями, и сразу рисует (worker_db).
+
+Воркеры запускаются через spawn, а не fork: fork копирует процесс бота с его потоками
+(пул БД, HTTP-клиент), и блокировка, захваченная в момент fork другим потоком,
+в копии не освобождается никогда. Новый процесс сам настраивает Django (_init_worker).
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from reports import delivery
+from reports.db_router import reporting
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+class RenderTimeout(Exception):
+    """Отрисовка не уложилась в REPORT_RENDER_TIMEOUT"""
+
+
+def _init_worker(settings_module):
+    # Функции отрисовки лежат в модулях с моделями — их импорт требует настроенного Django
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
+
+
+@contextmanager
+def worker_db():
+    """Чтение строк отчета из БД внутри воркера (как отчеты бота — с реплики, если она есть)"""
+    try:
+        with reporting():
+            yield
+    finally:
+        # Воркер живет долго, а отчеты редки — не держим соединение между задачами
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.REPORT_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(os.environ["DJANGO_SETTINGS_MODULE"],),
+        )
+    return _executor
+
+
+def _recycle():
+    # Зависший воркер нельзя прервать по отдельности: пул отбрасывается целиком,
+    # его процессы завершаются, новые задачи пойдут в новый пул. Других дочерних
+    # процессов multiprocessing у бота нет, поэтому active_children() — воркеры
+    # отброшенного пула (и не успевших завершиться прежних)
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+    for process in multiprocessing.active_children():
+        process.terminate()
+
+
+async def run(func, *args, timeout=None):
+    """Выполняет func(*args) в пуле процессов и ждет результат не дольше timeout секунд"""
+    timeout = timeout or settings.REPORT_RENDER_TIMEOUT
+    future = asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Отрисовка не уложилась в %s с", timeout)
+        _recycle()
+        raise RenderTimeout(f"Отчет формировался дольше {timeout:g} с")
+    except BrokenProcessPool:
+        # Пул завершили из-за зависшей задачи другого пользователя, пока эта выполнялась
+        raise RenderTimeout("Отрисовка прервана")
+
+
+def _render(func, args, max_bytes):
+    # Выполняется в воркере: большой результат сразу уходит во временный файл
+    return delivery.make_artifact(func(*args), max_bytes)
+
+
+async def render(func, *args, timeout=None):
+    """Как run, но результат (bytes) возвращается в виде delivery.Artifact"""
+    return await run(_render, func, args, settings.REPORT_MAX_BUFFER_BYTES, timeout=timeout)
+
+
+def shutdown():
+    """Останавливает пул при завершении бота"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,67 @@
+# reports/report_cache.py
+"""
+Кэш готовых отчетов (services.daily_report, services.range_report) на Django cache.
+
+Бэкенд — кэш "reports" из settings.CACHES: по умолчанию LocMemCache в памяти процесса,
+для общего кэша между API и ботом задается REPORT_CACHE_BACKEND/REPORT_CACHE_LOCATION.
+
+Ключ отчета включает версию данных его периода из дневных сводок
+(rollups.period_stamp) — ту же, по которой API строит ETag. Версия меняется
+в той же транзакции, что и запись, из любого процесса (API, бот, другой
+воркер), поэтому после коммита запрашивается уже новый ключ, а отчет по старым
+данным остается под старым. Сбрасывать кэш при записи не нужно: ключ стоит одного
+запроса по индексу сводок. TTL ограничивает жизнь неиспользуемых записей.
+На реплике (db_router) и версия, и отчет читаются с нее же, поэтому отставание
+реплики не попадает в кэш под новым ключом.
+"""
+from django.core.cache import caches
+
+from reports import rollups
+
+CACHE_ALIAS = "reports"
+STATS_KEYS = ("report:stats:hits", "report:stats:misses")
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _count(key):
+    cache = get_cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ успели вытеснить между add и incr — счетчик не важнее отчета
+        pass
+
+
+def _get_or_compute(key, compute):
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        _count(STATS_KEYS[0])
+        return value
+    _count(STATS_KEYS[1])
+    value = compute()
+    cache.set(key, value)
+    return value
+
+
+def daily(day, compute):
+    """Отчет за день из кэша или compute()"""
+    stamp = rollups.period_stamp(day, day)
+    return _get_or_compute(f"report:daily:{day}:{stamp}", compute)
+
+
+def period(date_from, date_to, compute):
+    """Отчет за период из кэша или compute()"""
+    stamp = rollups.period_stamp(date_from, date_to)
+    return _get_or_compute(f"report:range:{date_from}:{date_to}:{stamp}", compute)
+
+
+def stats():
+    """Счетчики попаданий и промахов кэша"""
+    hits, misses = (get_cache().get(key, 0) for key in STATS_KEYS)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 3) if total else None}
@@ -0,0 +1,270 @@
+# reports/rollups.py
+"""
+Инкрементальные сводки по дням (DailySummary) и месяцам (MonthlySummary).
+
+Каждая запись Sale/Expense вносит в сводку своего дня «вклад» (суммы и счетчики).
+При создании вклад прибавляется, при удалении вычитается, при изменении
+вычитается старый и прибавляется новый. Обновление идет атомарным
+UPDATE ... SET x = x + delta, поэтому параллельные записи не теряются.
+"""
+import calendar
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+
+from reports.models import ACTIVE_DAY, DailySummary, Expense, MonthlySummary, Sale
+
+SUMMARY_FIELDS = (
+    "sales_total", "sales_cash", "sales_card", "sales_invoice", "sales_count",
+    "expenses_total", "expenses_count",
+)
+
+
+def money(value):
+    """Приводит сумму к Decimal с копейками (в бот-хендлерах цены бывают float)"""
+    return Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def as_date(value):
+    """Дата из поля модели (до сохранения там может быть строка YYYY-MM-DD)"""
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def sale_contribution(sale_date, payment_method, total_price):
+    """Вклад одной продажи в сводку за день"""
+    total_price = money(total_price)
+    deltas = {"sales_total": total_price, "sales_count": 1}
+    field = f"sales_{payment_method}"
+    if field in SUMMARY_FIELDS:
+        deltas[field] = total_price
+    return {as_date(sale_date): deltas}
+
+
+def expense_contribution(expense_date, amount):
+    """Вклад одного расхода в сводку за день"""
+    return {as_date(expense_date): {"expenses_total": money(amount), "expenses_count": 1}}
+
+
+def merge(*contributions, sign=1):
+    """Складывает вклады по дням; sign=-1 вычитает"""
+    result = defaultdict(dict)
+    for contribution in contributions:
+        for day, deltas in contribution.items():
+            for field, value in deltas.items():
+                result[day][field] = result[day].get(field, 0) + sign * value
+    return result
+
+
+def diff(old, new):
+    """Разница между новым и старым вкладом (для изменения записи)"""
+    result = merge(new)
+    for day, deltas in old.items():
+        for field, value in deltas.items():
+            result[day][field] = result[day].get(field, 0) - value
+    # Выбрасываем нулевые изменения, чтобы не трогать строку без надобности
+    return {day: d for day, d in result.items() if any(v for v in d.values())}
+
+
+def _bump(model, lookup, deltas, values=None):
+    """Атомарно прибавляет deltas к строке сводки (и ставит values), создавая ее при необходимости"""
+    values = values or {}
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    updates.update(values)
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        # Строки еще нет: создаем ее, а при гонке с другой записью обновляем
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas, **values)
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**updates)
+
+
+def apply(contributions, touched=()):
+    """
+    Применяет изменения к сводкам; вызывать внутри транзакции записи.
+    Версия данных растет у каждого дня из contributions и touched,
+    даже если суммы не изменились (например, поменялось только название).
+    """
+    months = defaultdict(dict)
+    now = timezone.now()
+    # Строки сводок блокируются по возрастанию даты: две транзакции, меняющие одни и те же
+    # дни (перенос продажи на другую дату), не возьмут блокировки накрест (deadlock)
+    for day in sorted(set(contributions) | set(touched)):
+        deltas = {field: value for field, value in contributions.get(day, {}).items() if value}
+        # update() не трогает auto_now, поэтому время изменения ставим сами
+        _bump(DailySummary, {"date": day}, {**deltas, "version": 1}, {"updated_at": now})
+        month = months[(day.year, day.month)]
+        for field, value in deltas.items():
+            month[field] = month.get(field, 0) + value
+    for (year, month), deltas in months.items():
+        deltas = {field: value for field, value in deltas.items() if value}
+        if deltas:
+            _bump(MonthlySummary, {"year": year, "month": month}, deltas)
+
+
+def touch(day):
+    """Отмечает, что данные дня изменились (например, касса), без изменения сумм"""
+    apply({}, touched=[as_date(day)])
+
+
+def get_summary(day):
+    """Одна строка сводки за день или None"""
+    return DailySummary.objects.filter(date=day).first()
+
+
+def get_days(date_from, date_to):
+    """Дневные сводки за период, только дни с продажами или расходами (один запрос)"""
+    return list(
+        DailySummary.objects.filter(date__range=(date_from, date_to))
+        .filter(ACTIVE_DAY)
+        .order_by("date")
+    )
+
+
+def active_dates(before=None, after=None, date_from=None, date_to=None, limit=6):
+    """
+    Даты с продажами или расходами, от новых к старым, с курсором по дате:
+    before — строго раньше этой даты, after — строго позже (ближайшие к ней).
+    Один запрос по частичному индексу summary_active_date_idx, не больше limit строк.
+    """
+    days = DailySummary.objects.filter(ACTIVE_DAY)
+    if date_from:
+        days = days.filter(date__gte=date_from)
+    if date_to:
+        days = days.filter(date__lte=date_to)
+    if after:
+        dates = list(days.filter(date__gt=after).order_by("date").values_list("date", flat=True)[:limit])
+        return dates[::-1]
+    if before:
+        days = days.filter(date__lt=before)
+    return list(days.order_by("-date").values_list("date", flat=True)[:limit])
+
+
+def active_months(year=None):
+    """Месяцы (год, месяц) с продажами или расходами, от новых к старым (по месячным сводкам)"""
+    months = MonthlySummary.objects.filter(ACTIVE_DAY)
+    if year:
+        months = months.filter(year=year)
+    return list(months.order_by("-year", "-month").values_list("year", "month"))
+
+
+def period_version(date_from=None, date_to=None):
+    """
+    Версия данных за период (без границ — за все время) одним запросом к дневным сводкам:
+    {"stamp": строка версии, "updated_at": время последнего изменения или None}.
+    Сумма версий строго растет при любой записи в периоде, строки сводки не удаляются.
+    """
+    days = DailySummary.objects.all()
+    if date_from:
+        days = days.filter(date__gte=date_from)
+    if date_to:
+        days = days.filter(date__lte=date_to)
+    version = days.aggregate(days=Count("id"), version=Sum("version"), updated_at=Max("updated_at"))
+    return {"stamp": f"{version['days']}:{version['version'] or 0}", "updated_at": version["updated_at"]}
+
+
+def period_stamp(date_from, date_to):
+    """Строка версии данных за период (ключ кэша отчетов)"""
+    return period_version(date_from, date_to)["stamp"]
+
+
+def rebuild(date_from=None, date_to=None):
+    """Пересчитывает сводки из исходных таблиц Sale и Expense"""
+    sales = Sale.objects.all()
+    expenses = Expense.objects.all()
+    summaries = DailySummary.objects.all()
+    if date_from:
+        sales = sales.filter(sale_date__gte=date_from)
+        expenses = expenses.filter(date__gte=date_from)
+        summaries = summaries.filter(date__gte=date_from)
+    if date_to:
+        sales = sales.filter(sale_date__lte=date_to)
+        expenses = expenses.filter(date__lte=date_to)
+        summaries = summaries.filter(date__lte=date_to)
+
+    rows = defaultdict(dict)
+    sales = sales.values("sale_date").annotate(
+        sales_total=Sum("total_price"),
+        sales_cash=Sum("total_price", filter=Q(payment_method="cash")),
+        sales_card=Sum("total_price", filter=Q(payment_method="card")),
+        sales_invoice=Sum("total_price", filter=Q(payment_method="invoice")),
+        sales_count=Count("id"),
+    ).order_by()
+    for row in sales:
+        day = row.pop("sale_date")
+        rows[day].update({field: value or 0 for field, value in row.items()})
+    expenses = expenses.values("date").annotate(
+        expenses_total=Sum("amount"),
+        expenses_count=Count("id"),
+    ).order_by()
+    for row in expenses:
+        day = row.pop("date")
+        rows[day].update({field: value or 0 for field, value in row.items()})
+
+    with transaction.atomic():
+        # Версии не сбрасываем: иначе версия периода могла бы совпасть со старой.
+        # Дни, где данных больше нет, остаются нулевыми строками по той же причине
+        versions = dict(summaries.select_for_update().values_list("date", "version"))
+        for day in versions:
+            rows.setdefault(day, {})
+        summaries.delete()
+        DailySummary.objects.bulk_create(
+            [DailySummary(date=day, version=versions.get(day, 0) + 1, **values) for day, values in sorted(rows.items())],
+            batch_size=500,
+        )
+        _rebuild_months(date_from, date_to)
+    return len(rows)
+
+
+def _rebuild_months(date_from=None, date_to=None):
+    """Пересобирает месячные сводки из дневных (целыми месяцами)"""
+    days = DailySummary.objects.all()
+    months = MonthlySummary.objects.all()
+    if date_from:
+        days = days.filter(date__gte=date_from.replace(day=1))
+        months = months.filter(Q(year__gt=date_from.year) | Q(year=date_from.year, month__gte=date_from.month))
+    if date_to:
+        days = days.filter(date__lte=month_bounds(date_to.year, date_to.month)[1])
+        months = months.filter(Q(year__lt=date_to.year) | Q(year=date_to.year, month__lte=date_to.month))
+
+    totals = defaultdict(lambda: dict.fromkeys(SUMMARY_FIELDS, 0))
+    for row in days.values("date", *SUMMARY_FIELDS).iterator():
+        month = totals[(row["date"].year, row["date"].month)]
+        for field in SUMMARY_FIELDS:
+            month[field] += row[field]
+    months.delete()
+    MonthlySummary.objects.bulk_create(
+        [MonthlySummary(year=year, month=month, **values) for (year, month), values in sorted(totals.items())]
+    )
+
+
+def month_bounds(year, month):
+    """Первый и последний день месяца"""
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def get_month_days(year, month):
+    """Дневные сводки за месяц (не больше 31 строки по индексу на date)"""
+    return list(DailySummary.objects.filter(date__range=month_bounds(year, month)).order_by("date"))
+
+
+def get_month_summary(year, month):
+    """Одна строка сводки за месяц или None"""
+    return MonthlySummary.objects.filter(year=year, month=month).first()
+
+
+def get_year_months(year):
+    """Месячные сводки за год (не больше 12 строк)"""
+    return list(MonthlySummary.objects.filter(year=year).order_by("month"))
+
+
+def summary_to_dict(summary):
+    """Сводка в виде словаря; для дня без записей — нули"""
+    if summary is None:
+        return {field: Decimal("0.00") if not field.endswith("_count") else 0 for field in SUMMARY_FIELDS}
+    return {field: getattr(summary, field) for field in SUMMARY_FIELDS}
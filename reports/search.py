@@ -0,0 +1,128 @@
+# reports/search.py
+"""
+Поиск продаж по словам в названии и комментарии.
+
+Каждое слово запроса должно встретиться в названии или комментарии (порядок слов
+не важен, регистр тоже). На PostgreSQL поиск идет по GIN-индексам pg_trgm
+(они ускоряют ILIKE '%слово%'), на SQLite — по FTS5-таблице с токенизатором
+trigram. Индексы и FTS-таблицу создает миграция 0012_search_backend.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.db.models.expressions import RawSQL
+
+from reports import rollups
+from reports.models import Sale
+
+FTS_TABLE = "reports_sale_fts"
+# Токенизатор trigram ищет только по подстрокам от 3 символов
+FTS_MIN_WORD = 3
+
+
+def split_words(query):
+    """Слова запроса в нижнем регистре"""
+    return re.findall(r'\w+', query.lower())
+
+
+def _word_q(word):
+    return Q(name__icontains=word) | Q(comment__icontains=word)
+
+
+def _fts_available(conn):
+    with conn.cursor() as cursor:
+        return FTS_TABLE in conn.introspection.table_names(cursor)
+
+
+def _fts_expression(words):
+    # Каждое слово — отдельная фраза в кавычках, все слова через AND
+    return " AND ".join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+
+def search_sales(query, date_from=None, date_to=None):
+    """
+    Продажи, где встречаются все слова запроса, с полем rank (чем больше, тем лучше).
+    """
+    words = split_words(query)
+    sales = Sale.objects.all()
+    if date_from and date_to:
+        sales = sales.filter(sale_date__gte=date_from, sale_date__lte=date_to)
+
+    # БД, куда пойдет запрос (с reporting() — реплика, см. db_router)
+    conn = connections[sales.db]
+    if conn.vendor == "postgresql":
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        for word in words:
+            sales = sales.filter(_word_q(word))
+        if words:
+            return sales.annotate(rank=TrigramWordSimilarity(" ".join(words), "name"))
+        return sales.annotate(rank=Value(0.0, output_field=FloatField()))
+
+    fts_words = [word for word in words if len(word) >= FTS_MIN_WORD]
+    if conn.vendor == "sqlite" and fts_words and _fts_available(conn):
+        expression = _fts_expression(fts_words)
+        sales = sales.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression]
+        )).annotate(rank=RawSQL(
+            # bm25 у FTS5 отрицательный: меньше — лучше, поэтому меняем знак
+            f"SELECT -rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = reports_sale.id",
+            [expression], output_field=FloatField(),
+        ))
+        # Короткие слова FTS не ищет — проверяем их обычным фильтром
+        words = [word for word in words if len(word) < FTS_MIN_WORD]
+    else:
+        sales = sales.annotate(rank=Value(0.0, output_field=FloatField()))
+
+    for word in words:
+        sales = sales.filter(_word_q(word))
+    return sales
+
+
+def ranked(sales):
+    """Месяцы по порядку (отчет группирует строки по месяцам), внутри месяца — сначала самые релевантные"""
+    return sales.order_by(TruncMonth("sale_date"), F("rank").desc(nulls_last=True), "sale_date", "id")
+
+
+MONEY_FIELDS = ("amount", "cash", "card", "invoice")
+
+
+def summarize(sales):
+    """
+    Итоги поиска одним GROUP BY: по месяцам и по способам оплаты.
+    Возвращает {'months': [...], 'total': {...}} или None, если ничего не найдено.
+    """
+    rows = list(
+        sales.order_by()
+        .annotate(month=TruncMonth("sale_date"))
+        .values("month")
+        .annotate(
+            count=Count("id"),
+            quantity=Sum("quantity"),
+            amount=Sum("total_price"),
+            cash=Sum("total_price", filter=Q(payment_method="cash")),
+            card=Sum("total_price", filter=Q(payment_method="card")),
+            invoice=Sum("total_price", filter=Q(payment_method="invoice")),
+        )
+        .order_by("month")
+    )
+    if not rows:
+        return None
+
+    total = dict.fromkeys(("count", "quantity", "amount", "cash", "card", "invoice"), 0)
+    for row in rows:
+        for field in total:
+            # SQLite возвращает суммы без округления (211.100000000000) — приводим к копейкам
+            row[field] = rollups.money(row[field] or 0) if field in MONEY_FIELDS else row[field] or 0
+            total[field] += row[field]
+    return {"months": rows, "total": total}
+
+
+DETAIL_FIELDS = ("name", "quantity", "total_price", "payment_method", "sale_date")
+
+
+def iter_details(sales, chunk_size=500):
+    """Строки продаж для отчета кортежами в порядке ranked, порциями из курсора без загрузки всех объектов"""
+    return ranked(sales).values_list(*DETAIL_FIELDS).iterator(chunk_size=chunk_size)
@@ -1,27 +1,87 @@
+from decimal import Decimal
+
 from rest_framework import serializers
+from . import services
 from .models import Sale, Expense, CashRegister
 
-class SaleSerializer(serializers.ModelSerializer):
+
+def requested_fields(request):
+    """Поля из параметра ?fields=a,b,c или None, если параметр не передан"""
+    value = request.query_params.get("fields") if request is not None else None
+    if not value:
+        return None
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Ответ только с полями из ?fields= (id выводится всегда)"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = requested_fields(self.context.get("request"))
+        if requested is not None:
+            fields = {name: field for name, field in fields.items() if name in requested or name == "id"}
+        return fields
+
+
+class BatchListSerializer(serializers.ListSerializer):
+    """Создание списка записей одной пачкой: child.batch_create -> (записи, остаток кассы)"""
+
+    def create(self, validated_data):
+        instances, self.cash_total = self.child.batch_create(validated_data)
+        return instances
+
+
+class SaleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Остаток кассы после создания продажи за наличные (только в ответе на создание)
+    cash_total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
     class Meta:
         model = Sale
         fields = '__all__'
+        list_serializer_class = BatchListSerializer
+        # Границы через extra_kwargs (порядок полей в ответе — как в модели): иначе
+        # отрицательное значение дойдет до CHECK в БД, и пачка упадет с 500 вместо ошибки строки
+        extra_kwargs = {
+            "quantity": {"min_value": 0},
+            "price_per_unit": {"min_value": Decimal("0")},
+        }
+
+    def get_fields(self):
+        # Объявленные поля DRF ставит первыми; cash_total — в конец, после полей модели
+        fields = super().get_fields()
+        if "cash_total" in fields:
+            fields["cash_total"] = fields.pop("cash_total")
+        return fields
+
+    def create(self, validated_data):
+        sale, sale.cash_total = services.create_sale(**validated_data)
+        return sale
 
-class ExpenseSerializer(serializers.ModelSerializer):
+    def batch_create(self, rows):
+        return services.create_sales(rows)
+
+    def update(self, instance, validated_data):
+        return services.update_sale(instance, **validated_data)
+
+class ExpenseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Expense
         fields = '__all__'
+        list_serializer_class = BatchListSerializer
 
     def create(self, validated_data):
-        expense = super().create(validated_data)
-        today = expense.date
-        cash, created = CashRegister.objects.get_or_create(date=today)
-        cash.cash_total -= expense.amount
-        cash.cash_total = max(0, cash.cash_total)  # Защита от отрицательных значений
-        cash.save()
+        expense, _ = services.add_expense(**validated_data)
         return expense
 
+    def batch_create(self, rows):
+        return services.add_expenses(rows)
+
+    def update(self, instance, validated_data):
+        return services.update_expense(instance, **validated_data)
+
 
-class CashRegisterSerializer(serializers.ModelSerializer):
+class CashRegisterSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CashRegister
         fields = '__all__'
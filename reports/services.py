@@ -0,0 +1,192 @@
+# reports/services.py
+"""
+Операции записи (продажи, расходы, касса) и отчеты по сводкам.
+
+Здесь же и движения по кассе, которые сопровождают запись: продажа за наличные
+пополняет кассу, расход вычитается из нее, изменение и удаление корректируют
+остаток на разницу. Каждая операция — одна транзакция. Функции вызываются
+и из API (views, serializers), и из бота напрямую, без HTTP.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+
+from reports import cash, report_cache, rollups
+from reports.models import Expense, Sale
+
+
+class ServiceError(Exception):
+    """Некорректные данные операции (в API — ответ 400)"""
+
+
+def sale_cash_share(sale):
+    """Сколько продажа вносит в кассу"""
+    return rollups.money(sale.total_price) if sale.payment_method == "cash" else Decimal("0.00")
+
+
+def _touch_today(day):
+    """Нужно ли кассе поднимать версию сегодняшнего дня: запись за сегодня ее уже подняла"""
+    return rollups.as_date(day) != date.today()
+
+
+def create_sale(**fields):
+    """Создает продажу; за наличные сразу пополняет кассу. Возвращает (sale, остаток или None)"""
+    with transaction.atomic():
+        sale = Sale.objects.create(**fields)
+        cash_total = None
+        if sale.payment_method == "cash":
+            cash_total = cash.record_movement(sale_cash_share(sale), sale=sale, touch=_touch_today(sale.sale_date))
+    return sale, cash_total
+
+
+def create_sales(rows):
+    """
+    Пачка продаж (список словарей полей) одним bulk_create в одной транзакции.
+    Сигналы не вызываются, поэтому сводки и касса обновляются здесь
+    один раз на всю пачку: наличные продажи дают одно изменение остатка.
+    Возвращает (продажи, остаток или None).
+    """
+    sales = [Sale(**fields) for fields in rows]
+    for sale in sales:
+        # Как в Sale.save
+        sale.total_price = sale.quantity * sale.price_per_unit
+    with transaction.atomic():
+        Sale.objects.bulk_create(sales)
+        contributions = rollups.merge(*(rollups.sale_contribution(s.sale_date, s.payment_method, s.total_price) for s in sales))
+        rollups.apply(contributions)
+        cash_sales = [(sale_cash_share(sale), sale, None) for sale in sales if sale.payment_method == "cash"]
+        cash_total = cash.record_movements(cash_sales, touch=date.today() not in contributions) if cash_sales else None
+    return sales, cash_total
+
+
+def update_sale(sale, **fields):
+    """Изменяет продажу; касса меняется на разницу наличных до и после"""
+    with transaction.atomic():
+        old = Sale.objects.select_for_update().get(pk=sale.pk)
+        for field, value in fields.items():
+            setattr(sale, field, value)
+        sale.save()
+        delta = sale_cash_share(sale) - sale_cash_share(old)
+        if delta:
+            cash.record_movement(delta, sale=sale, touch=_touch_today(sale.sale_date))
+    return sale
+
+
+def delete_sale(sale):
+    """Удаляет продажу и возвращает из кассы внесенные ей наличные"""
+    with transaction.atomic():
+        share = sale_cash_share(sale)
+        if share:
+            cash.record_movement(-share, sale=sale, touch=_touch_today(sale.sale_date))
+        sale.delete()
+
+
+def add_expense(**fields):
+    """Создает расход и вычитает его из кассы. Возвращает (expense, остаток)"""
+    fields.setdefault("date", date.today())
+    with transaction.atomic():
+        expense = Expense.objects.create(**fields)
+        cash_total = cash.record_movement(-rollups.money(expense.amount), expense=expense, touch=_touch_today(expense.date))
+    return expense, cash_total
+
+
+def add_expenses(rows):
+    """Пачка расходов одним bulk_create; сводки и касса — один раз на пачку. Возвращает (расходы, остаток)"""
+    expenses = [Expense(**{"date": date.today(), **fields}) for fields in rows]
+    with transaction.atomic():
+        Expense.objects.bulk_create(expenses)
+        contributions = rollups.merge(*(rollups.expense_contribution(e.date, e.amount) for e in expenses))
+        rollups.apply(contributions)
+        cash_total = cash.record_movements([(-rollups.money(e.amount), None, e) for e in expenses], touch=date.today() not in contributions)
+    return expenses, cash_total
+
+
+def update_expense(expense, **fields):
+    """Изменяет расход; касса меняется на разницу сумм"""
+    with transaction.atomic():
+        old = Expense.objects.select_for_update().get(pk=expense.pk)
+        for field, value in fields.items():
+            setattr(expense, field, value)
+        expense.save()
+        delta = rollups.money(old.amount) - rollups.money(expense.amount)
+        if delta:
+            cash.record_movement(delta, expense=expense, touch=_touch_today(expense.date))
+    return expense
+
+
+def delete_expense(expense):
+    """Удаляет расход и возвращает его сумму в кассу"""
+    with transaction.atomic():
+        cash.record_movement(rollups.money(expense.amount), expense=expense, touch=_touch_today(expense.date))
+        expense.delete()
+
+
+def top_up_cash(amount, sale=None):
+    """Пополняет кассу и возвращает новый остаток"""
+    amount = rollups.money(amount)
+    if amount <= 0:
+        raise ServiceError("Сумма пополнения должна быть положительной!")
+    return cash.record_movement(amount, sale=sale)
+
+
+def _report_totals(summary):
+    """Поля отчета из словаря сводки (rollups.summary_to_dict)"""
+    return {
+        "total_sales": summary["sales_total"],
+        "sales_cash": summary["sales_cash"],
+        "sales_card": summary["sales_card"],
+        "sales_invoice": summary["sales_invoice"],
+        "sales_count": summary["sales_count"],
+        "total_expenses": summary["expenses_total"],
+        "expenses_count": summary["expenses_count"],
+    }
+
+
+def daily_report(day=None):
+    """Итоги дня: одна строка сводки, одна строка кассы и список расходов, если они были"""
+    day = day or date.today()
+    return report_cache.daily(day, lambda: _daily_report(day))
+
+
+def _daily_report(day):
+    summary = rollups.summary_to_dict(rollups.get_summary(day))
+    expenses = list(Expense.objects.filter(date=day).order_by("id").values("reason", "amount")) if summary["expenses_count"] else []
+    return {
+        "date": day,
+        **_report_totals(summary),
+        "expenses": expenses,
+        "cash_total": max(Decimal("0.00"), cash.get_balance_by_date(day)),  # Защита от отрицательных значений
+    }
+
+
+def range_report(date_from, date_to):
+    """
+    Итоги за период с разбивкой по дням (только дни с записями).
+    Один запрос к дневным сводкам и один к кассе; остаток — на последний день периода, когда менялась касса.
+    """
+    if date_from > date_to:
+        raise ServiceError("Начало периода позже конца")
+    return report_cache.period(date_from, date_to, lambda: _range_report(date_from, date_to))
+
+
+def _range_report(date_from, date_to):
+    days = rollups.get_days(date_from, date_to)
+    balances = cash.get_balances(date_from, date_to)
+
+    totals = dict.fromkeys(rollups.SUMMARY_FIELDS, 0)
+    breakdown = []
+    for day in days:
+        summary = rollups.summary_to_dict(day)
+        for field, value in summary.items():
+            totals[field] += value
+        breakdown.append({"date": day.date, **_report_totals(summary), "cash_total": balances.get(day.date)})
+
+    totals = {field: rollups.money(value) if not field.endswith("_count") else value for field, value in totals.items()}
+    return {
+        "from": date_from,
+        "to": date_to,
+        **_report_totals(totals),
+        "cash_total": max(Decimal("0.00"), balances[max(balances)]) if balances else Decimal("0.00"),
+        "days": breakdown,
+    }
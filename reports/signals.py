@@ -0,0 +1,71 @@
+# reports/signals.py
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from reports import rollups
+from reports.models import CashRegister, Expense, Sale
+
+
+def _sale_state(sale):
+    return rollups.sale_contribution(sale.sale_date, sale.payment_method, sale.total_price)
+
+
+def _expense_state(expense):
+    return rollups.expense_contribution(expense.date, expense.amount)
+
+
+@receiver(pre_save, sender=Sale)
+def remember_old_sale(sender, instance, raw=False, **kwargs):
+    # Запоминаем вклад строки до изменения (строка блокируется до конца транзакции)
+    instance._rollup_old = {}
+    if raw or instance.pk is None:
+        return
+    old = Sale.objects.select_for_update().filter(pk=instance.pk).first()
+    if old is not None:
+        instance._rollup_old = _sale_state(old)
+
+
+@receiver(post_save, sender=Sale)
+def update_summary_on_sale_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old, new = getattr(instance, "_rollup_old", {}), _sale_state(instance)
+    rollups.apply(rollups.diff(old, new), touched=[*old, *new])
+    instance._rollup_old = {}
+
+
+@receiver(post_delete, sender=Sale)
+def update_summary_on_sale_delete(sender, instance, **kwargs):
+    rollups.apply(rollups.merge(_sale_state(instance), sign=-1))
+
+
+@receiver(pre_save, sender=Expense)
+def remember_old_expense(sender, instance, raw=False, **kwargs):
+    instance._rollup_old = {}
+    if raw or instance.pk is None:
+        return
+    old = Expense.objects.select_for_update().filter(pk=instance.pk).first()
+    if old is not None:
+        instance._rollup_old = _expense_state(old)
+
+
+@receiver(post_save, sender=Expense)
+def update_summary_on_expense_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old, new = getattr(instance, "_rollup_old", {}), _expense_state(instance)
+    rollups.apply(rollups.diff(old, new), touched=[*old, *new])
+    instance._rollup_old = {}
+
+
+@receiver(post_delete, sender=Expense)
+def update_summary_on_expense_delete(sender, instance, **kwargs):
+    rollups.apply(rollups.merge(_expense_state(instance), sign=-1))
+
+
+# Правка строки кассы напрямую (например, в админке) тоже меняет версию данных дня
+@receiver(post_save, sender=CashRegister)
+@receiver(post_delete, sender=CashRegister)
+def touch_summary_on_cash_register_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rollups.touch(instance.date)
@@ -0,0 +1,28 @@
+# reports/singleflight.py
+"""
+Объединение одинаковых параллельных задач в боте (single-flight).
+
+Если отчет с тем же ключом уже строится, следующий запрос не запускает вторую
+сборку, а ждет первую и получает ее результат. После завершения ключ освобождается,
+поэтому следующий запрос после этого уже строит отчет заново (или берет его из кэша).
+Работает в пределах одного event loop — процесса бота.
+"""
+import asyncio
+
+_in_flight = {}
+
+
+async def do(key, func):
+    """
+    Выполняет корутинную функцию func() один раз на ключ для всех одновременных вызовов.
+    Возвращает (результат, shared): shared=True — результат получен от чужой сборки.
+    Исключение сборки получают все ожидающие.
+    """
+    task = _in_flight.get(key)
+    shared = task is not None
+    if not shared:
+        task = asyncio.ensure_future(func())
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    # shield: отмена одного ожидающего не отменяет сборку для остальных
+    return await asyncio.shield(task), shared
@@ -1,3 +1,608 @@
-from django.test import TestCase
+import asyncio
+import os
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, router, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from reports import bot_api, cash, db_router, export, report_cache, rollups, search, services, views
+from reports.handlers import report_handlers
+from reports.models import ACTIVE_DAY, CashMovement, CashRegister, DailySummary, Expense, MonthlySummary, Sale
+from reports.serializers import SaleSerializer
+
+START = date(2024, 1, 1)
+DAYS = 400
+HAS_REPLICA = "replica" in settings.DATABASES
+
+
+class HotQueryIndexTests(TestCase):
+    """
+    Частые запросы API и бота идут по индексам: в плане EXPLAIN нет полного
+    просмотра таблицы. На PostgreSQL seq scan запрещается (enable_seqscan=off) —
+    если он все равно в плане, подходящего индекса нет.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        methods = ("cash", "card", "invoice")
+        Sale.objects.bulk_create(
+            [
+                Sale(
+                    name=f"Фанера {i % 30} мм", quantity=i % 5 + 1, price_per_unit=Decimal("100.00"),
+                    total_price=Decimal("100.00") * (i % 5 + 1), payment_method=methods[i % 3],
+                    sale_date=START + timedelta(days=i % DAYS), shipment_date=START, comment="",
+                )
+                for i in range(4000)
+            ]
+        )
+        Expense.objects.bulk_create(
+            [Expense(reason="Бензин", amount=Decimal("50.00"), comment="", date=START + timedelta(days=i % DAYS)) for i in range(1000)]
+        )
+        rollups.rebuild()
+        # auto_now_add не дает задать дату при создании — переносим строки кассы после
+        for i in range(30):
+            register = CashRegister.objects.create(cash_total=Decimal(i))
+            CashRegister.objects.filter(pk=register.pk).update(date=START + timedelta(days=i))
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+
+    def assertNoFullScan(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == "postgresql":
+            self.assertNotIn("Seq Scan", plan, plan)
+        else:
+            # SQLite: "SCAN reports_sale" без "USING ... INDEX" — чтение всей таблицы
+            self.assertIsNone(re.search(r"SCAN \w+(?! USING)(\s|$)", plan), plan)
+
+    def test_sales_by_day(self):
+        # PDF за день и список продаж за сегодня
+        day = START + timedelta(days=10)
+        self.assertNoFullScan(Sale.objects.filter(sale_date=day).order_by("id"))
+
+    def test_sales_range_list(self):
+        # GET /api/sales/?date_from=&date_to= (курсорная пагинация) и выгрузка
+        date_from, date_to = START + timedelta(days=30), START + timedelta(days=60)
+        self.assertNoFullScan(Sale.objects.filter(sale_date__gte=date_from, sale_date__lte=date_to).order_by("-sale_date", "-id"))
+        self.assertNoFullScan(export.sales_queryset(date_from, date_to))
+
+    def test_sales_by_payment_method(self):
+        # GET /api/sales/?payment_method=cash&date_from=
+        self.assertNoFullScan(
+            Sale.objects.filter(payment_method="cash", sale_date__gte=START + timedelta(days=100)).order_by("-sale_date", "-id")
+        )
+
+    def test_sales_sums_by_payment_method(self):
+        # Суммы по дням и способам оплаты (пересчет сводок, итоги по дням в Excel)
+        queryset = (
+            Sale.objects.filter(sale_date__range=(START, START + timedelta(days=31)))
+            .values("sale_date", "payment_method")
+            .annotate(total=Sum("total_price"))
+            .order_by("sale_date")
+        )
+        self.assertNoFullScan(queryset)
+        if connection.vendor == "sqlite":
+            self.assertIn("COVERING INDEX sale_date_method_total_idx", queryset.explain())
+
+    def test_expenses(self):
+        day = START + timedelta(days=5)
+        self.assertNoFullScan(Expense.objects.filter(date=day).order_by("id"))
+        self.assertNoFullScan(export.expenses_queryset(day, day + timedelta(days=30)))
+
+    def test_cash_register(self):
+        # Остаток за день, за период и последний остаток
+        self.assertNoFullScan(CashRegister.objects.filter(date=START))
+        self.assertNoFullScan(CashRegister.objects.filter(date__range=(START, START + timedelta(days=7))))
+        self.assertNoFullScan(CashRegister.objects.order_by("-date")[:1])
+
+    def test_daily_summaries(self):
+        # Дни с записями за период (отчет за период) и версия данных периода (ETag, кэш file_id)
+        date_from, date_to = START, START + timedelta(days=90)
+        self.assertNoFullScan(DailySummary.objects.filter(date__range=(date_from, date_to)).filter(ACTIVE_DAY).order_by("date"))
+        self.assertNoFullScan(DailySummary.objects.filter(date__gte=date_from, date__lte=date_to).values("version", "updated_at"))
+        self.assertEqual(len(rollups.get_days(date_from, date_to)), 91)
+
+    def test_active_days_use_partial_index(self):
+        queryset = DailySummary.objects.filter(ACTIVE_DAY).filter(date__gte=START).order_by("-date")
+        self.assertNoFullScan(queryset)
+        if connection.vendor == "sqlite":
+            self.assertIn("summary_active_date_idx", queryset.explain())
+
+
+def _sale(name="Фанера"):
+    return Sale(
+        name=name, quantity=1, price_per_unit=Decimal("100.00"), payment_method="card",
+        sale_date=START, shipment_date=START, comment="",
+    )
+
+
+class ReportingRouterFallbackTests(SimpleTestCase):
+    """Без настроенной реплики отчеты читаются из основной БД"""
+
+    @override_settings(REPORTS_DB_ALIAS="missing")
+    def test_missing_replica_uses_primary(self):
+        with db_router.reporting():
+            self.assertFalse(db_router.reading_replica())
+            self.assertEqual(router.db_for_read(Sale), DEFAULT_DB_ALIAS)
+
+    @override_settings(REPORTS_DB_ALIAS="")
+    def test_disabled_replica_uses_primary(self):
+        with db_router.reporting():
+            self.assertEqual(router.db_for_read(Sale), DEFAULT_DB_ALIAS)
+
+    def test_writes_go_to_primary(self):
+        with db_router.reporting():
+            self.assertEqual(router.db_for_write(Sale), DEFAULT_DB_ALIAS)
+
+    @override_settings(REPORTS_DB_ALIAS="missing")
+    def test_replica_from_env_missing_warns(self):
+        with patch.dict(os.environ, {"DB_REPLICA_NAME": "replica.sqlite3"}):
+            self.assertEqual([w.id for w in db_router.check_replica(None)], ["reports.W001"])
+        with patch.dict(os.environ, clear=True):
+            self.assertEqual(db_router.check_replica(None), [])
+
+
+@skipUnless(HAS_REPLICA, "Нужна реплика: DB_REPLICA_NAME или DB_REPLICA_HOST")
+@override_settings(REPORTS_DB_ALIAS="replica")
+class ReportingRouterReplicaTests(TransactionTestCase):
+    """
+    Две отдельные БД (например, два файла SQLite): реплика пустая, поэтому
+    по количеству строк видно, куда ушел запрос.
+    TestCase не подходит — он держит открытую транзакцию, а в ней чтения идут в основную БД.
+    """
+    # Сборщик тестов смотрит databases и у пропущенных классов
+    databases = {"default", "replica"} if HAS_REPLICA else {"default"}
+
+    def setUp(self):
+        _sale().save()
+
+    def test_reporting_reads_replica(self):
+        with db_router.reporting():
+            self.assertEqual(Sale.objects.count(), 0)
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_decorated_function_reads_replica(self):
+        count = db_router.reporting()(Sale.objects.count)
+        self.assertEqual(count(), 0)
+
+    def test_writes_under_reporting_go_to_primary(self):
+        with db_router.reporting():
+            _sale("Брус").save()
+        self.assertEqual(Sale.objects.using("default").count(), 2)
+        self.assertEqual(Sale.objects.using("replica").count(), 0)
+
+    def test_transaction_reads_primary(self):
+        # Чтение своих же записей внутри транзакции
+        with db_router.reporting(), transaction.atomic():
+            self.assertEqual(Sale.objects.count(), 1)
+
+
+class ReportCacheTests(TestCase):
+    """Ключ кэша — версия данных из БД, поэтому запись из любого процесса сразу меняет отчет"""
+
+    def setUp(self):
+        report_cache.get_cache().clear()
+
+    def test_repeated_report_is_cached(self):
+        services.daily_report(START)
+        services.daily_report(START)
+        self.assertEqual(report_cache.stats()["hits"], 1)
+
+    def test_write_without_signals_changes_report(self):
+        # Так выглядит запись другого процесса: в этом процессе ничего не сбрасывается
+        self.assertEqual(services.daily_report(START)["sales_count"], 0)
+        with transaction.atomic():
+            rollups.apply(rollups.sale_contribution(START, "card", Decimal("1000.00")))
+        report = services.daily_report(START)
+        self.assertEqual(report["sales_count"], 1)
+        self.assertEqual(report["total_sales"], Decimal("1000.00"))
+
+    def test_range_report_sees_write(self):
+        services.range_report(START, START + timedelta(days=31))
+        _sale().save()
+        self.assertEqual(services.range_report(START, START + timedelta(days=31))["sales_count"], 1)
+
+
+class CashVersionTests(TestCase):
+    """Запись с движением по кассе поднимает версию дня один раз"""
+
+    def version(self):
+        return DailySummary.objects.get(date=date.today()).version
+
+    def test_cash_sale_today(self):
+        services.create_sale(
+            name="Фанера", quantity=2, price_per_unit=Decimal("100.00"), payment_method="cash",
+            sale_date=date.today(), shipment_date=date.today(), comment="",
+        )
+        self.assertEqual(self.version(), 1)
+        self.assertEqual(cash.get_balance_by_date(date.today()), Decimal("200.00"))
+
+    def test_expense_today(self):
+        services.add_expense(reason="Бензин", amount=Decimal("50.00"), comment="")
+        self.assertEqual(self.version(), 1)
+
+    def test_top_up(self):
+        services.top_up_cash(Decimal("10.00"))
+        services.top_up_cash(Decimal("5.00"))
+        self.assertEqual(self.version(), 2)
+        self.assertEqual(cash.get_balance_by_date(date.today()), Decimal("15.00"))
+
+
+class MergeCashRegistersMigrationTests(TransactionTestCase):
+    """Дубли кассы за день (до unique на date) сливаются в одну строку с суммой остатков"""
+    before = [("reports", "0004_cashmovement")]
+    after = [("reports", "0006_cashregister_unique_date")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        # Обратно до последних миграций: после этой в цепочке есть и другие
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes("reports"))
+
+    def test_duplicates_merged(self):
+        CashRegister = self.migrate(self.before).get_model("reports", "CashRegister")
+        rows = CashRegister.objects.bulk_create([CashRegister(cash_total=Decimal(v)) for v in ("10.00", "2.50", "7.00")])
+        # auto_now_add ставит сегодняшнюю дату — третью строку переносим на другой день
+        CashRegister.objects.filter(pk=rows[2].pk).update(date=START)
+
+        CashRegister = self.migrate(self.after).get_model("reports", "CashRegister")
+        self.assertEqual(
+            sorted(CashRegister.objects.values_list("date", "cash_total")),
+            [(START, Decimal("7.00")), (date.today(), Decimal("12.50"))],
+        )
+
+
+class SearchBackendMigrationTests(TransactionTestCase):
+    """Поисковые индексы создает и убирает миграция, а не post_migrate"""
+    before = [("reports", "0011_hot_query_indexes")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes("reports"))
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5 — только на SQLite")
+    def test_fts_table_reversible(self):
+        def tables():
+            with connection.cursor() as cursor:
+                return connection.introspection.table_names(cursor)
+
+        self.assertIn(search.FTS_TABLE, tables())
+        MigrationExecutor(connection).migrate(self.before)
+        self.assertNotIn(search.FTS_TABLE, tables())
+        # Продажа без FTS-таблицы: после миграции вперед она попадает в индекс (rebuild)
+        _sale("Фанера березовая").save()
+        self.tearDown()
+        self.assertEqual([sale.name for sale in search.search_sales("березовая")], ["Фанера березовая"])
+
+
+class SearchRankingTests(TestCase):
+    """Строки отчета по поиску: месяцы по порядку, внутри месяца — сначала самые релевантные"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rows = [
+            ("Фанера березовая 10 мм, влагостойкая, шлифованная", START),
+            ("Фанера", START + timedelta(days=5)),
+            ("Фанера", START + timedelta(days=40)),
+        ]
+        for name, day in rows:
+            sale = _sale(name)
+            sale.sale_date = day
+            sale.save()
+
+    def test_relevant_first_within_month(self):
+        rows = list(search.iter_details(search.search_sales("фанера")))
+        self.assertEqual([(row[0], row[4]) for row in rows], [
+            ("Фанера", START + timedelta(days=5)),
+            ("Фанера березовая 10 мм, влагостойкая, шлифованная", START),
+            ("Фанера", START + timedelta(days=40)),
+        ])
+
+
+class SaleBatchValidationTests(TestCase):
+    """Неверная строка пачки дает ошибку этой строки (400), а не IntegrityError из БД"""
+
+    def row(self, **fields):
+        return {
+            "name": "Фанера", "quantity": 1, "price_per_unit": "100.00", "payment_method": "card",
+            "sale_date": str(START), "shipment_date": str(START), "comment": "", **fields,
+        }
+
+    def test_negative_values_rejected_per_row(self):
+        rows = [self.row(), self.row(quantity=-1), self.row(price_per_unit="-5.00")]
+        response = APIClient().post("/api/sales/batch/", rows, format="json")
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("quantity", errors[1])
+        self.assertIn("price_per_unit", errors[2])
+        self.assertFalse(Sale.objects.exists())
+
+    def test_field_order_follows_model(self):
+        # Порядок полей ответа — как в модели (как до явных границ значений)
+        model_fields = [field.name for field in Sale._meta.concrete_fields]
+        self.assertEqual(list(SaleSerializer().fields), model_fields + ["cash_total"])
+
+
+class BotApiLocalTests(TestCase):
+    """Операции бота в режиме local (синхронные тела db_task)"""
+
+    def setUp(self):
+        self.sale = _sale()
+        self.sale.payment_method = "cash"
+        self.sale.save()
+
+    def test_update_sale_partial(self):
+        result = bot_api._update_sale.__wrapped__(self.sale.pk, {"quantity": 3, "price_per_unit": 50.0})
+        self.assertEqual(result.status, 200)
+        self.sale.refresh_from_db()
+        self.assertEqual(self.sale.total_price, Decimal("150.00"))
+        self.assertEqual(bot_api._update_sale.__wrapped__(0, {}).status, 404)
+
+    def test_delete_sale(self):
+        self.assertEqual(bot_api._delete_sale.__wrapped__(self.sale.pk).status, 204)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_top_up_key_bound_to_sale(self):
+        # Тот же ключ и сумма, но другая продажа — не повтор, а ошибка 422
+        other = _sale("Брус")
+        other.save()
+        top_up = bot_api._top_up_cash.__wrapped__
+        self.assertEqual(top_up("10.00", self.sale.pk, "key").status, 201)
+        self.assertEqual(top_up("10.00", self.sale.pk, "key").status, 201)
+        self.assertEqual(top_up("10.00", other.pk, "key").status, 422)
+        self.assertEqual(CashMovement.objects.filter(sale=self.sale).count(), 1)
+
+
+class SearchSummaryTests(TestCase):
+    def test_money_quantized(self):
+        for price in ("100.10", "111.00"):
+            sale = _sale()
+            sale.price_per_unit, sale.payment_method = Decimal(price), "cash"
+            sale.save()
+        total = search.summarize(search.search_sales("фанера"))["total"]
+        self.assertEqual(str(total["amount"]), "211.10")
+        self.assertEqual(str(total["cash"]), "211.10")
+        self.assertEqual(str(total["card"]), "0.00")
+
+
+class FastListOutputTests(TestCase):
+    """Списки через values() + FastJSONRenderer побайтно совпадают с ModelSerializer + JSONRenderer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            sale = _sale(f"Фанера {i} мм «F/W»")
+            sale.quantity, sale.payment_method = i + 1, ("cash", "card", "invoice")[i % 3]
+            sale.sale_date = START + timedelta(days=i // 2)
+            sale.comment = "Доставка \"до двери\"" if i % 2 else ""
+            sale.save()
+        for i in range(3):
+            services.add_expense(reason=f"Расход {i}", amount=Decimal("10.50") * (i + 1), comment="", date=START + timedelta(days=i))
+        # Строку кассы за сегодня создали расходы; переносим ее в прошлое (date с auto_now_add)
+        CashRegister.objects.update(date=START)
+        CashRegister.objects.bulk_create([CashRegister(cash_total=Decimal("7.25"))])
+
+    def assert_same_output(self, view, url):
+        fast = APIClient().get(url)
+        with patch.object(view, "renderer_classes", (JSONRenderer,)):
+            baseline = APIClient().get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, baseline.content)
+        # Поля в порядке модели, как у ModelSerializer с fields="__all__" без объявленных полей
+        data = fast.json()
+        model_fields = [field.name for field in view.queryset.model._meta.concrete_fields]
+        for row in data["results"]:
+            self.assertEqual(list(row), [name for name in model_fields if name in row])
+        return data
+
+    def test_sales(self):
+        for query in ("", "?fields=name,total_price,sale_date", "?payment_method=cash", "?page_size=2"):
+            with self.subTest(query=query):
+                self.assert_same_output(views.SaleViewSet, f"/api/sales/{query}")
+
+    def test_sales_next_page(self):
+        data = self.assert_same_output(views.SaleViewSet, "/api/sales/?page_size=2&fields=name")
+        self.assert_same_output(views.SaleViewSet, data["next"])
+
+    def test_expenses(self):
+        for query in ("", "?fields=amount,reason"):
+            with self.subTest(query=query):
+                self.assert_same_output(views.ExpenseViewSet, f"/api/expenses/{query}")
+
+    def test_cash_register(self):
+        for query in ("", "?fields=cash_total"):
+            with self.subTest(query=query):
+                data = self.assert_same_output(views.CashRegisterViewSet, f"/api/cash_register/{query}")
+                self.assertEqual(len(data["results"]), 2)
+
+
+class ConditionalGetTests(TestCase):
+    """304 по ETag, пока данные за период и сам запрос не изменились"""
+
+    def setUp(self):
+        _sale().save()
+        self.client = APIClient()
+
+    def assert_not_modified(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag, **headers).status_code, 304)
+        return etag
+
+    def test_daily_report(self):
+        url = f"/api/report/?date={START}"
+        etag = self.assert_not_modified(url)
+        _sale("Брус").save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_range_report(self):
+        url = f"/api/report/range/?from={START}&to={START + timedelta(days=30)}"
+        etag = self.assert_not_modified(url)
+        _sale("Брус").save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list(self):
+        for url in ("/api/sales/", "/api/expenses/", "/api/cash_register/"):
+            with self.subTest(url=url):
+                self.assert_not_modified(url)
+
+    def test_list_etag_depends_on_query(self):
+        _sale("Брус").save()
+        url = f"/api/sales/?date_from={START}&page_size=1"
+        etag = self.assert_not_modified(url)
+        # Те же параметры в другом порядке — тот же ответ
+        self.assertEqual(self.client.get(f"/api/sales/?page_size=1&date_from={START}", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        next_page = self.client.get(url).json()["next"]
+        for other in (f"{url}&payment_method=cash", f"{url}&fields=name", next_page):
+            with self.subTest(url=other):
+                self.assertEqual(self.client.get(other, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        # Другой формат ответа (JSON с отступами)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT="application/json; indent=4")
+        self.assertEqual(response.status_code, 200)
+
+
+class RollupSignalTests(TestCase):
+    """Сводки по дням и месяцам, которые поддерживают сигналы, и их пересчет rebuild_rollups"""
+
+    def setUp(self):
+        self.sale = _sale()
+        self.sale.save()
+
+    def day(self, day):
+        return rollups.summary_to_dict(rollups.get_summary(day))
+
+    def test_sale_created(self):
+        summary = self.day(START)
+        self.assertEqual((summary["sales_total"], summary["sales_card"], summary["sales_count"]), (Decimal("100.00"), Decimal("100.00"), 1))
+        self.assertEqual(rollups.get_month_summary(START.year, START.month).sales_total, Decimal("100.00"))
+
+    def test_sale_date_changed(self):
+        # Перенос в другой месяц: день и месяц уменьшаются у старой даты и растут у новой
+        moved = START + timedelta(days=40)
+        self.sale.sale_date = moved
+        self.sale.save()
+        self.assertEqual((self.day(START)["sales_total"], self.day(START)["sales_count"]), (Decimal("0.00"), 0))
+        self.assertEqual((self.day(moved)["sales_total"], self.day(moved)["sales_count"]), (Decimal("100.00"), 1))
+        self.assertEqual(rollups.get_month_summary(START.year, START.month).sales_total, Decimal("0.00"))
+        self.assertEqual(rollups.get_month_summary(moved.year, moved.month).sales_total, Decimal("100.00"))
+
+    def test_payment_method_changed(self):
+        self.sale.payment_method = "cash"
+        self.sale.save()
+        summary = self.day(START)
+        self.assertEqual((summary["sales_card"], summary["sales_cash"], summary["sales_total"]), (Decimal("0.00"), Decimal("100.00"), Decimal("100.00")))
+
+    def test_deleted(self):
+        expense, _ = services.add_expense(reason="Клей", amount=Decimal("30.00"), comment="", date=START)
+        self.sale.delete()
+        expense.delete()
+        summary = self.day(START)
+        self.assertEqual((summary["sales_total"], summary["sales_count"]), (Decimal("0.00"), 0))
+        self.assertEqual((summary["expenses_total"], summary["expenses_count"]), (Decimal("0.00"), 0))
+        self.assertEqual(rollups.get_month_summary(START.year, START.month).sales_total, Decimal("0.00"))
+
+    def test_version_grows(self):
+        version = rollups.get_summary(START).version
+        self.sale.name = "Брус"
+        self.sale.save()
+        self.assertGreater(rollups.get_summary(START).version, version)
+
+    def test_rebuild_rollups(self):
+        services.add_expense(reason="Клей", amount=Decimal("30.00"), comment="", date=START + timedelta(days=1))
+        expected = {day: self.day(day) for day in (START, START + timedelta(days=1))}
+        # Сводки разошлись с таблицами: запись без сигналов и испорченная строка
+        unsaved = _sale("Брус")
+        unsaved.total_price = unsaved.price_per_unit * unsaved.quantity
+        Sale.objects.bulk_create([unsaved])
+        expected[START].update(sales_total=Decimal("200.00"), sales_card=Decimal("200.00"), sales_count=2)
+        DailySummary.objects.filter(date=START + timedelta(days=1)).update(expenses_total=Decimal("999.00"))
+        MonthlySummary.objects.all().delete()
+
+        call_command("rebuild_rollups", stdout=StringIO())
+        for day, summary in expected.items():
+            self.assertEqual(self.day(day), summary)
+        month = rollups.get_month_summary(START.year, START.month)
+        self.assertEqual((month.sales_total, month.expenses_total), (Decimal("200.00"), Decimal("30.00")))
+
+
+class ActiveDatesPagingTests(TestCase):
+    """Страницы дат «Старые отчеты»: курсор по дате и лишняя строка ITEMS_PER_PAGE + 1"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Два полных листа: 10 дней через один, с 1 по 19 января
+        cls.days = [START + timedelta(days=2 * i) for i in range(2 * report_handlers.ITEMS_PER_PAGE)]
+        with transaction.atomic():
+            for day in cls.days:
+                rollups.apply(rollups.sale_contribution(day, "card", Decimal("100.00")))
+            # День без продаж и расходов (только касса) в список не попадает
+            rollups.touch(START + timedelta(days=1))
+
+    def keyboard(self, before=None, after=None, month=None):
+        # Даты читаются заранее в этом потоке: данные теста не закоммичены, из пула потоков их не видно
+        dates = report_handlers.get_active_dates.__wrapped__(before, after, month)
+
+        async def local(*args):
+            self.assertEqual(args, (before, after, month))
+            return dates
+
+        with patch.object(report_handlers, "get_active_dates", local):
+            markup = asyncio.run(report_handlers.create_dates_keyboard(before, after, month))
+        data = [button.callback_data for row in markup.inline_keyboard for button in row]
+        dates = [value.split(":", 1)[1] for value in data if value.startswith("report_date:")]
+        pages = {value.split(":")[1] for value in data if value.startswith("report_page:")}
+        return dates, pages
+
+    def test_active_dates_cursor(self):
+        newest = self.days[::-1]
+        self.assertEqual(rollups.active_dates(limit=3), newest[:3])
+        self.assertEqual(rollups.active_dates(before=newest[2], limit=3), newest[3:6])
+        # after — ближайшие более новые, тоже от новых к старым
+        self.assertEqual(rollups.active_dates(after=newest[6], limit=3), newest[3:6])
+        self.assertEqual(rollups.active_dates(after=newest[1], limit=3), newest[:1])
+        self.assertEqual(rollups.active_dates(before=self.days[0]), [])
+
+    def test_month_scope(self):
+        days = rollups.active_dates(date_from=START + timedelta(days=5), date_to=START + timedelta(days=12), limit=10)
+        self.assertEqual(days, [START + timedelta(days=d) for d in (12, 10, 8, 6)])
+        february = report_handlers.get_active_dates.__wrapped__(None, None, (2024, 2))
+        self.assertEqual(february, [])
+
+    def test_keyboard_page_edges(self):
+        size = report_handlers.ITEMS_PER_PAGE
+        newest = [str(day) for day in self.days[::-1]]
+        # Первая страница: лишняя строка есть — только «Вперед»
+        dates, pages = self.keyboard()
+        self.assertEqual((dates, pages), (newest[:size], {"older"}))
+        # Вторая — ровно ITEMS_PER_PAGE дат до конца: только «Назад»
+        dates, pages = self.keyboard(before=self.days[::-1][size - 1])
+        self.assertEqual((dates, pages), (newest[size:], {"newer"}))
+        # Назад со второй страницы: снова первая, новее нее ничего нет
+        dates, pages = self.keyboard(after=self.days[::-1][size])
+        self.assertEqual((dates, pages), (newest[:size], {"older"}))
+
+    def test_keyboard_month(self):
+        dates, pages = self.keyboard(month=(2024, 1))
+        self.assertEqual(len(dates), report_handlers.ITEMS_PER_PAGE)
+        dates, pages = self.keyboard(month=(2024, 2))
+        self.assertEqual((dates, pages), ([], set()))
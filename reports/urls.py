@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SaleViewSet, ExpenseViewSet, CashRegisterViewSet, daily_report, add_expense, update_cash
+from .views import SaleViewSet, ExpenseViewSet, CashRegisterViewSet, daily_report, range_report, report_cache_stats, export_sales, export_expenses, add_expense, update_cash
 
 router = DefaultRouter()
 router.register(r'sales', SaleViewSet)
@@ -10,6 +10,10 @@ router.register(r'cash_register', CashRegisterViewSet)
 urlpatterns = [
     path('api/', include(router.urls)),
     path('api/report/', daily_report, name="daily_report"),
+    path('api/report/range/', range_report, name="range_report"),
+    path('api/report/cache/', report_cache_stats, name="report_cache_stats"),
+    path('api/export/sales/', export_sales, name="export_sales"),
+    path('api/export/expenses/', export_expenses, name="export_expenses"),
     path('api/expenses/', add_expense, name="add_expense"),
     path('api/cash/', update_cash, name="update_cash"),
 
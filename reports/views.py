@@ -1,87 +1,269 @@
 from django.shortcuts import render
 
 # Create your views here.
-from rest_framework import viewsets
+from rest_framework import serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
 from .models import Sale, Expense, CashRegister
-from .serializers import SaleSerializer, ExpenseSerializer, CashRegisterSerializer
+from .serializers import SaleSerializer, ExpenseSerializer, CashRegisterSerializer, requested_fields
 from django.utils.timezone import now
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
 import json
 import logging
 from decimal import Decimal
-from django.db.models import Sum
-from django.http import JsonResponse
-from django.utils.timezone import now
-from .models import Sale, Expense, CashRegister
+from django.db import transaction
 from datetime import date
+from django.utils.decorators import method_decorator
+from . import export, report_cache, services
+from .conditional import data_version
+from .db_router import reporting
+from .idempotency import idempotent
+from .pagination import DateCursorPagination
+from .renderers import FastJSONRenderer
 
 
 logger = logging.getLogger(__name__)
 
-class SaleViewSet(viewsets.ModelViewSet):
+
+def _list_period(request, *args, **kwargs):
+    # Период списка из ?date_from=&date_to= (без них — все время)
+    params = request.GET
+    return (
+        date.fromisoformat(params["date_from"]) if params.get("date_from") else None,
+        date.fromisoformat(params["date_to"]) if params.get("date_to") else None,
+    )
+
+
+# Поля, которые сериализатор выводит как есть (строки values() совпадают с его выводом)
+FAST_FIELD_TYPES = (
+    serializers.IntegerField, serializers.CharField, serializers.ChoiceField,
+    serializers.DecimalField, serializers.DateField, serializers.BooleanField,
+)
+
+
+class ListFilterMixin:
+    """
+    Фильтры списка: ?date_from=&date_to= по полю date_field, точные совпадения
+    по exact_filters и ?fields= — из БД читаются только запрошенные колонки.
+    Списки постраничные (DateCursorPagination по date_field и id).
+
+    JSON-список строится без ModelSerializer: строки берутся через values()
+    и кодируются FastJSONRenderer, результат побайтно тот же.
+    """
+    date_field = "date"
+    exact_filters = ()
+    pagination_class = DateCursorPagination
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+
+    @property
+    def cursor_ordering(self):
+        return (f"-{self.date_field}", "-id")
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != "list":
+            return queryset
+        params = self.request.query_params
+        try:
+            date_from, date_to = _list_period(self.request)
+        except ValueError:
+            raise ValidationError({"date": "Дата в формате YYYY-MM-DD"})
+        if date_from:
+            queryset = queryset.filter(**{f"{self.date_field}__gte": date_from})
+        if date_to:
+            queryset = queryset.filter(**{f"{self.date_field}__lte": date_to})
+        for name in self.exact_filters:
+            if params.get(name):
+                queryset = queryset.filter(**{name: params[name]})
+
+        fields = requested_fields(self.request)
+        if fields is not None:
+            model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+            # Поля сортировки нужны пагинации для курсора следующей страницы
+            queryset = queryset.only(*(fields & model_fields), self.date_field)
+        return queryset
+
+    def get_fast_fields(self):
+        """Поля списка для values() или None, если вывод сериализатора так не повторить"""
+        model = self.get_queryset().model
+        model_fields = {field.name for field in model._meta.concrete_fields}
+        names = []
+        for name, field in self.get_serializer().fields.items():
+            if field.write_only:
+                continue
+            if field.read_only and field.default is empty and field.source != "*" and not hasattr(model, field.source):
+                # Как и DRF, пропускаем поле, которого нет у записи (cash_total продажи)
+                continue
+            if field.source != name or name not in model_fields or not isinstance(field, FAST_FIELD_TYPES):
+                return None
+            names.append(name)
+        return names
+
+    # Повторный запрос без изменений в данных за период получает 304
+    @method_decorator(data_version(_list_period))
+    def list(self, request, *args, **kwargs):
+        fields = self.get_fast_fields()
+        if fields is None or not isinstance(request.accepted_renderer, FastJSONRenderer):
+            return super().list(request, *args, **kwargs)
+
+        # Поле даты нужно пагинации для курсора, в ответ оно попадает, только если запрошено
+        extra = [self.date_field] if self.date_field not in fields else []
+        queryset = self.filter_queryset(self.get_queryset()).values(*fields, *extra)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            # Ссылки на страницы строятся по строкам страницы, поэтому лишнее поле убираем после
+            response, rows = self.get_paginated_response(page), page
+        else:
+            rows = list(queryset)
+            response = Response(rows)
+        for row in rows:
+            for name in extra:
+                del row[name]
+        return response
+
+
+class BatchCreateMixin:
+    """
+    POST <список>/batch/ — массив записей. Проверяются все строки; если хоть одна
+    с ошибкой, ничего не создается и в ответе errors — ошибки по строкам
+    в порядке запроса ({} у верных). Иначе все строки создаются одной пачкой
+    (BatchListSerializer), касса меняется один раз.
+    """
+    batch_max_rows = 1000
+
+    # Повтор запроса с тем же Idempotency-Key не создает запись второй раз
+    @method_decorator(idempotent)
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @method_decorator(idempotent)
+    @action(detail=False, methods=["post"])
+    def batch(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True, allow_empty=False, max_length=self.batch_max_rows)
+        if not serializer.is_valid():
+            return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        cash_total = serializer.cash_total
+        return Response(
+            {"count": len(serializer.instance), "cash_total": None if cash_total is None else str(cash_total), "results": serializer.data},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class SaleViewSet(BatchCreateMixin, ListFilterMixin, viewsets.ModelViewSet):
     queryset = Sale.objects.all()
     serializer_class = SaleSerializer
+    date_field = "sale_date"
+    exact_filters = ("payment_method",)
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        services.delete_sale(instance)
+
+class ExpenseViewSet(BatchCreateMixin, ListFilterMixin, viewsets.ModelViewSet):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
 
-class CashRegisterViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        services.delete_expense(instance)
+
+class CashRegisterViewSet(ListFilterMixin, viewsets.ModelViewSet):
     queryset = CashRegister.objects.all()
     serializer_class = CashRegisterSerializer
 
 
 
 
+def _parse_date(request, name, default=None):
+    value = request.GET.get(name)
+    if not value:
+        if default is None:
+            raise ValueError(f"Не указан параметр {name}")
+        return default
+    return date.fromisoformat(value)
+
+
+def _report_day(request):
+    day = _parse_date(request, "date", date.today())
+    return day, day
+
+
+def _report_period(request):
+    return _parse_date(request, "from"), _parse_date(request, "to")
+
+
+@reporting()
+@data_version(_report_day)
 def daily_report(request):
-    today = date.today()
+    # Итоги берем из одной строки сводки вместо агрегатов по всей таблице; ?date=YYYY-MM-DD, по умолчанию сегодня
+    try:
+        day = _parse_date(request, "date", date.today())
+    except ValueError as e:
+        return JsonResponse({"error": f"Неверная дата: {e}"}, status=400)
+    return JsonResponse(services.daily_report(day))
 
-    sales = Sale.objects.filter(sale_date=today)
-    expenses = Expense.objects.filter(date=today)
-    cash = CashRegister.objects.filter(date=today).last()
 
-    total_sales = sales.aggregate(Sum("total_price"))["total_price__sum"] or 0
-    total_expenses = expenses.aggregate(Sum("amount"))["amount__sum"] or 0
+def report_cache_stats(request):
+    # Попадания и промахи кэша отчетов (для LocMemCache — только этого процесса)
+    return JsonResponse(report_cache.stats())
 
-    # Разделение продаж по методам оплаты
-    sales_cash = sales.filter(payment_method="cash").aggregate(Sum("total_price"))["total_price__sum"] or 0
-    sales_card = sales.filter(payment_method="card").aggregate(Sum("total_price"))["total_price__sum"] or 0
-    sales_invoice = sales.filter(payment_method="invoice").aggregate(Sum("total_price"))["total_price__sum"] or 0
 
-    # Если фиксировали кассу, используем ее сумму
-    cash_total = cash.cash_total if cash else 0
+def _export(request, queryset_func, fields, name, **filters):
+    # ?date_from=&date_to=&q=&format=csv|ndjson&gzip=1
+    params = request.GET
+    try:
+        date_from, date_to = _list_period(request)
+    except ValueError:
+        return JsonResponse({"error": "Дата в формате YYYY-MM-DD"}, status=400)
+    fmt = params.get("format", "csv")
+    if fmt not in export.FORMATS:
+        return JsonResponse({"error": f"Формат: {', '.join(export.FORMATS)}"}, status=400)
+    encode, content_type = export.FORMATS[fmt]
 
+    queryset = queryset_func(date_from, date_to, params.get("q"), **filters)
+    stream = encode(fields, export.iter_rows(queryset, fields))
+    compress = params.get("gzip") in ("1", "true")
+    if compress:
+        stream = export.gzip_stream(stream)
 
-    # Учитываем продажи за наличные
-    # cash_total = sales_cash
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    period = f"_{date_from or ''}_{date_to or ''}" if date_from or date_to else ""
+    response["Content-Disposition"] = f'attachment; filename="{name}{period}.{fmt}"'
+    if compress:
+        response["Content-Encoding"] = "gzip"
+    return response
 
-    # Вычитаем расходы
-    # cash_total -= total_expenses
-    cash_total = max(0, cash_total)  # Защита от отрицательных значений
 
-    # Формируем список расходов
-    expense_list = list(expenses.values("reason", "amount"))
+@require_GET
+def export_sales(request):
+    # Выгрузка продаж потоком, без загрузки всей таблицы в память
+    return _export(request, export.sales_queryset, export.SALE_FIELDS, "sales",
+                   payment_method=request.GET.get("payment_method"))
 
-    data = {
-        "total_sales": total_sales,
-        "sales_cash": sales_cash,
-        "sales_card": sales_card,
-        "sales_invoice": sales_invoice,
-        "total_expenses": total_expenses,
-        "expenses": expense_list,
-        "cash_total": cash_total
-    }
 
-    return JsonResponse(data)
+@require_GET
+def export_expenses(request):
+    return _export(request, export.expenses_queryset, export.EXPENSE_FIELDS, "expenses")
 
 
+@reporting()
+@data_version(_report_period)
+def range_report(request):
+    # Итоги за период ?from=YYYY-MM-DD&to=YYYY-MM-DD с разбивкой по дням
+    try:
+        report = services.range_report(_parse_date(request, "from"), _parse_date(request, "to"))
+    except (ValueError, services.ServiceError) as e:
+        return JsonResponse({"error": f"Неверный период: {e}"}, status=400)
+    return JsonResponse(report)
 
-from django.db import transaction
 
-from django.db import transaction
 
 @csrf_exempt
+@idempotent
 @transaction.atomic
 def add_expense(request):
     if request.method == "POST":
@@ -92,23 +274,11 @@ def add_expense(request):
             comment = data.get("comment", "")
             today = now().date()
 
-            # Получаем или создаем запись кассы на сегодня
-            cash, created = CashRegister.objects.get_or_create(date=today)
-            logger.debug(f"Получен расход: {amount}, текущая касса: {cash.cash_total}")
-            # Вычитаем сумму расхода
-            cash.cash_total -= amount
-            cash.save()
-            logger.debug(f"Касса обновлена: id={cash.id}, cash_total={cash.cash_total}")
-
-            # Создаем запись о расходе
-            Expense.objects.create(
-                reason=reason,
-                amount=amount,
-                comment=comment,
-                date=today
-            )
-
-            return JsonResponse({"message": "✅ Расход добавлен!", "cash_total": str(cash.cash_total)}, status=201)
+            # Создаем расход и вычитаем его из кассы в одной транзакции
+            expense, cash_total = services.add_expense(reason=reason, amount=amount, comment=comment, date=today)
+            logger.debug(f"Получен расход: {amount}, касса: {cash_total}")
+
+            return JsonResponse({"message": "✅ Расход добавлен!", "cash_total": str(cash_total)}, status=201)
         except Exception as e:
             logger.error(f"Ошибка при добавлении расхода: {e}")
             return JsonResponse({"error": "Внутренняя ошибка сервера"}, status=500)
@@ -119,28 +289,24 @@ def add_expense(request):
 
 
 @csrf_exempt
+@idempotent
 def update_cash(request):
     if request.method == "POST":
         try:
             data = json.loads(request.body)
             amount = Decimal(data.get("amount", 0))  # Преобразуем к Decimal
 
-            if amount <= 0:
-                logger.error("Попытка добавить неположительное значение!")
-                return JsonResponse({"error": "Сумма пополнения должна быть положительной!"}, status=400)
-
-            today = now().date()
-
-            # Логируем, что происходит при получении или создании записи
-            cash, created = CashRegister.objects.get_or_create(date=today)
-            logger.debug(f"Найдена/создана запись для {today}: {cash}, Создано? {created}")
+            # Продажа, из-за которой пополняется касса (если передана)
+            sale = Sale.objects.filter(pk=data["sale"]).first() if data.get("sale") else None
 
-            # Прибавляем деньги к кассе, теперь все типы Decimal
-            cash.cash_total += amount
-            cash.save(update_fields=["cash_total"])
+            # Прибавляем деньги к кассе атомарно, с записью в журнал
+            cash_total = services.top_up_cash(amount, sale=sale)
 
-            logger.debug(f"Новый баланс: {cash.cash_total}")
-            return JsonResponse({"message": "✅ Касса обновлена!", "cash_total": str(cash.cash_total)}, status=201)
+            logger.debug(f"Новый баланс: {cash_total}")
+            return JsonResponse({"message": "✅ Касса обновлена!", "cash_total": str(cash_total)}, status=201)
+        except services.ServiceError as e:
+            logger.error("Попытка добавить неположительное значение!")
+            return JsonResponse({"error": str(e)}, status=400)
         except Exception as e:
             logger.error(f"Ошибка при обновлении кассы: {e}")
             return JsonResponse({"error": f"Внутренняя ошибка: {str(e)}"}, status=500)
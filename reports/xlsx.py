@@ -0,0 +1,133 @@
+# reports/xlsx.py
+"""
+Выгрузка продаж и расходов в Excel (XLSX).
+
+Книга создается в режиме write_only: строки из итераторов queryset сразу
+пишутся на диск, а не копятся в памяти, поэтому размер периода не ограничен.
+Листы: продажи, расходы (кроме выгрузки поиска) и итоги по дням. Книга строится
+в пуле потоков БД бота (build), чтобы не блокировать event loop.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from reports import delivery, export
+from reports.db_executor import db_task
+from reports.db_router import reporting
+from reports.models import ACTIVE_DAY, DailySummary
+from reports.pdf import PAYMENT_METHODS
+
+SALE_FIELDS = ("sale_date", "name", "quantity", "price_per_unit", "total_price", "payment_method", "shipment_date", "comment")
+SALE_HEADERS = ("Дата", "Название", "Количество", "Цена", "Сумма", "Оплата", "Отгрузка", "Комментарий")
+EXPENSE_FIELDS = ("date", "reason", "amount", "comment")
+EXPENSE_HEADERS = ("Дата", "Причина", "Сумма", "Комментарий")
+DAY_HEADERS = ("Дата", "Продажи", "Наличные", "Карта", "Счет", "Расходы", "Продаж", "Расходов")
+MONEY_FORMAT = "#,##0.00"
+
+
+def _sheet(workbook, title, headers, widths):
+    sheet = workbook.create_sheet(title)
+    for letter, width in zip("ABCDEFGH", widths):
+        sheet.column_dimensions[letter].width = width
+    sheet.freeze_panes = "A2"
+    row = []
+    for header in headers:
+        cell = WriteOnlyCell(sheet, value=header)
+        cell.font = Font(bold=True)
+        row.append(cell)
+    sheet.append(row)
+    return sheet
+
+
+def _money_row(sheet, values, money_columns):
+    row = []
+    for i, value in enumerate(values):
+        cell = WriteOnlyCell(sheet, value=value)
+        if i in money_columns:
+            cell.number_format = MONEY_FORMAT
+        row.append(cell)
+    sheet.append(row)
+
+
+def _day_rows(date_from, date_to, query):
+    if not query:
+        # Без поиска итоги по дням берутся из дневных сводок
+        days = DailySummary.objects.filter(ACTIVE_DAY)
+        if date_from:
+            days = days.filter(date__gte=date_from)
+        if date_to:
+            days = days.filter(date__lte=date_to)
+        return days.order_by("date").values_list(
+            "date", "sales_total", "sales_cash", "sales_card", "sales_invoice", "expenses_total", "sales_count", "expenses_count",
+        ).iterator(chunk_size=export.CHUNK_SIZE)
+    # По найденным продажам — один GROUP BY по дате
+    return (
+        (day, total, cash or 0, card or 0, invoice or 0, None, count, None)
+        for day, total, cash, card, invoice, count in (
+            export.sales_queryset(date_from, date_to, query).order_by().values("sale_date")
+            .annotate(
+                total=Sum("total_price"),
+                cash=Sum("total_price", filter=Q(payment_method="cash")),
+                card=Sum("total_price", filter=Q(payment_method="card")),
+                invoice=Sum("total_price", filter=Q(payment_method="invoice")),
+                count=Count("id"),
+            )
+            .order_by("sale_date")
+            .values_list("sale_date", "total", "cash", "card", "invoice", "count")
+            .iterator(chunk_size=export.CHUNK_SIZE)
+        )
+    )
+
+
+def write_workbook(path, date_from=None, date_to=None, query=None):
+    """
+    Пишет книгу в файл path. date_from/date_to — границы периода (None — без границы),
+    query — слова поиска продаж (тогда в книге нет листа расходов).
+    Возвращает количество строк продаж и расходов.
+    """
+    workbook = Workbook(write_only=True)
+    count = 0
+
+    sheet = _sheet(workbook, "Продажи", SALE_HEADERS, (12, 40, 12, 12, 14, 12, 12, 30))
+    sales = export.sales_queryset(date_from, date_to, query)
+    for row in export.iter_rows(sales, SALE_FIELDS):
+        row = list(row)
+        row[5] = PAYMENT_METHODS.get(row[5], row[5])
+        _money_row(sheet, row, (3, 4))
+        count += 1
+
+    if not query:
+        sheet = _sheet(workbook, "Расходы", EXPENSE_HEADERS, (12, 40, 14, 30))
+        expenses = export.expenses_queryset(date_from, date_to)
+        for row in export.iter_rows(expenses, EXPENSE_FIELDS):
+            _money_row(sheet, row, (2,))
+            count += 1
+
+    sheet = _sheet(workbook, "По дням", DAY_HEADERS, (12, 14, 14, 14, 14, 14, 10, 10))
+    for row in _day_rows(date_from, date_to, query):
+        _money_row(sheet, row, (1, 2, 3, 4, 5))
+
+    workbook.save(path)
+    return count
+
+
+@db_task
+@reporting()
+def build(date_from=None, date_to=None, query=None):
+    """Книга в виде delivery.Artifact или None, если в периоде нет строк (в пуле потоков БД бота)"""
+    fd, path = tempfile.mkstemp(prefix="report_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        count = write_workbook(path, date_from, date_to, query)
+    except BaseException:
+        os.remove(path)
+        raise
+    if not count:
+        os.remove(path)
+        return None
+    return delivery.file_artifact(path, settings.REPORT_MAX_BUFFER_BYTES)
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sales_reports.settings')
+# Под ASGI синхронные view выполняются в новых потоках, и постоянное соединение
+# на поток (CONN_MAX_AGE > 0) остается открытым после запроса. По умолчанию
+# соединение закрывается в конце запроса; для переиспользования — DB_POOL=1
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
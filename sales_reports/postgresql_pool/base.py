@@ -0,0 +1,122 @@
+# sales_reports/postgresql_pool/base.py
+"""
+Бэкенд PostgreSQL с пулом соединений в процессе (ENGINE = "sales_reports.postgresql_pool").
+
+Django 4.2 не умеет пул сам (OPTIONS["pool"] появился только в 5.1), поэтому
+соединение, которое Django «закрывает» в конце запроса (CONN_MAX_AGE = 0),
+здесь возвращается в пул, а следующее «открытие» берет готовое соединение
+из пула без нового TCP/TLS-рукопожатия и авторизации. Пул общий для всех
+потоков процесса (WSGI-воркеры с потоками, ASGI), один на алиас БД.
+
+Настройки в DATABASES[alias]["POOL"]: MAX_SIZE — не больше стольких соединений
+одновременно (остальные запросы ждут), TIMEOUT — сколько секунд ждать свободное.
+С CONN_HEALTH_CHECKS соединение из пула проверяется SELECT 1 перед выдачей.
+"""
+import threading
+from collections import deque
+
+from django.db.backends.postgresql import base
+
+# conn.info.transaction_status: IDLE — вне транзакции, UNKNOWN — соединение сломано
+STATUS_IDLE = 0
+STATUS_UNKNOWN = 4
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(base.Database.OperationalError):
+    """Свободное соединение не появилось за POOL["TIMEOUT"] секунд"""
+
+
+class ConnectionPool:
+    def __init__(self, max_size=10, timeout=30):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+        # Одно место — одно выданное или простаивающее соединение
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def get(self, connect, check=None):
+        """Соединение из пула или новое (connect()); check(conn) -> False — соединение выбрасывается"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"Нет свободного соединения в пуле за {self.timeout} с")
+        try:
+            while True:
+                with self._lock:
+                    # LIFO: чаще переиспользуются одни и те же «теплые» соединения
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    return connect()
+                if not conn.closed and (check is None or check(conn)):
+                    return conn
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def put(self, conn):
+        """Возвращает соединение; незавершенная транзакция откатывается, сломанное соединение закрывается"""
+        try:
+            if conn.closed:
+                return
+            status = conn.info.transaction_status
+            if status == STATUS_UNKNOWN:
+                self._discard(conn)
+                return
+            if status != STATUS_IDLE:
+                conn.rollback()
+            with self._lock:
+                self._idle.append(conn)
+        except base.Database.Error:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Закрывает простаивающие соединения"""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for conn in idle:
+            self._discard(conn)
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except base.Database.Error:
+            pass
+
+
+def get_pool(alias, options):
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(options.get("MAX_SIZE", 10), options.get("TIMEOUT", 30))
+        return _pools[alias]
+
+
+def _ping(conn):
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        # Без autocommit SELECT открыл транзакцию — Django ждет соединение вне транзакции
+        if not conn.autocommit:
+            conn.rollback()
+        return True
+    except base.Database.Error:
+        return False
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get("POOL") or {})
+
+    def get_new_connection(self, conn_params):
+        check = _ping if self.settings_dict["CONN_HEALTH_CHECKS"] else None
+        return self.pool.get(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params), check)
+
+    def _close(self):
+        if self.connection is not None:
+            self.pool.put(self.connection)
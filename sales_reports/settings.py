@@ -18,6 +18,9 @@ import sys
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Загружаем переменные из .env до всех настроек, которые их читают (DATABASES и ниже)
+load_dotenv()
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -79,15 +82,48 @@ WSGI_APPLICATION = 'sales_reports.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'sales_reports',
-        'USER': 'soddos',
-        'PASSWORD': 'Shax312mir',
-        'HOST': '185.255.133.33',
-        'PORT': '5432',
+        'ENGINE': os.getenv("DB_ENGINE", 'django.db.backends.postgresql'),
+        'NAME': os.getenv("DB_NAME", 'sales_reports'),
+        'USER': os.getenv("DB_USER", 'soddos'),
+        'PASSWORD': os.getenv("DB_PASSWORD", 'Shax312mir'),
+        'HOST': os.getenv("DB_HOST", '185.255.133.33'),
+        'PORT': os.getenv("DB_PORT", '5432'),
+        # Сколько секунд держать соединение между запросами (0 — закрывать после каждого запроса)
+        'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        # Перед повторным использованием соединение проверяется, упавшее переоткрывается
+        'CONN_HEALTH_CHECKS': os.getenv("DB_CONN_HEALTH_CHECKS", "1") == "1",
     }
 }
 
+# DB_POOL=1 — пул соединений в процессе (см. sales_reports/postgresql_pool): соединение
+# берется из пула на время запроса и возвращается в него в конце запроса вместо закрытия.
+# Для ASGI и WSGI-серверов с потоками, где постоянное соединение на каждый поток не годится
+if os.getenv("DB_POOL") == "1":
+    DATABASES['default'].update({
+        'ENGINE': 'sales_reports.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': int(os.getenv("DB_POOL_SIZE", 10)),
+            'TIMEOUT': float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        },
+    })
+
+# Реплика для чтения отчетов и поиска (reports.db_router): те же настройки, что у основной БД,
+# кроме DB_REPLICA_HOST/DB_REPLICA_PORT/DB_REPLICA_NAME. Без реплики отчеты читаются из основной БД.
+# Локально на SQLite: DB_ENGINE=django.db.backends.sqlite3 DB_NAME=primary.sqlite3 DB_REPLICA_NAME=replica.sqlite3
+if os.getenv("DB_REPLICA_HOST") or os.getenv("DB_REPLICA_NAME"):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv("DB_REPLICA_HOST", DATABASES['default']['HOST']),
+        'PORT': os.getenv("DB_REPLICA_PORT", DATABASES['default']['PORT']),
+        'NAME': os.getenv("DB_REPLICA_NAME", DATABASES['default']['NAME']),
+    }
+
+DATABASE_ROUTERS = ['reports.db_router.ReportingRouter']
+
+# Алиас БД из DATABASES для чтения отчетов; пусто — всегда основная БД
+REPORTS_DB_ALIAS = os.getenv("REPORTS_DB_ALIAS", "replica")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -157,9 +193,6 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Загружаем переменные из .env
-load_dotenv()
-
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 if not BOT_TOKEN:
@@ -170,3 +203,46 @@ if not BOT_TOKEN:
 
 CREATOR_ID = int(os.getenv("CREATOR_ID"))
 ADMIN_IDS = [int(id) for id in os.getenv("ADMIN_IDS").split(",")]
+
+
+# Отрисовка отчетов в пуле процессов (бот)
+
+REPORT_RENDER_WORKERS = int(os.getenv("REPORT_RENDER_WORKERS", 2))
+REPORT_RENDER_TIMEOUT = float(os.getenv("REPORT_RENDER_TIMEOUT", 120))
+# Отчеты больше этого размера отправляются из временного файла, а не из памяти
+REPORT_MAX_BUFFER_BYTES = int(os.getenv("REPORT_MAX_BUFFER_BYTES", 20 * 1024 * 1024))
+
+
+# HTTP-клиент бота для запросов к API (reports.api_client)
+
+API_BASE_URL = os.getenv("API_BASE_URL", "http://185.255.133.33:8001/api/")
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", 10))
+API_RETRIES = int(os.getenv("API_RETRIES", 2))
+API_RETRY_BACKOFF = float(os.getenv("API_RETRY_BACKOFF", 0.5))
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", 10))
+
+# Как бот выполняет операции записи (reports.bot_api):
+# "local" — напрямую через reports.services, "http" — через API по API_BASE_URL
+BOT_API_MODE = os.getenv("BOT_API_MODE", "local")
+
+
+# Кэш отчетов (reports.report_cache). По умолчанию в памяти процесса;
+# для общего кэша API и бота, например:
+# REPORT_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache REPORT_CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "reports": {
+        "BACKEND": os.getenv("REPORT_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("REPORT_CACHE_LOCATION", "reports"),
+        "TIMEOUT": int(os.getenv("REPORT_CACHE_TIMEOUT", 300)),
+    },
+}
+
+# Сколько секунд хранится ответ на запрос с Idempotency-Key (reports.idempotency)
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 3600))
+
+# Потоки (и соединения с БД) для запросов бота к БД (reports.db_executor)
+BOT_DB_WORKERS = int(os.getenv("BOT_DB_WORKERS", 4))